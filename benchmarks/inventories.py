@@ -0,0 +1,56 @@
+"""
+Benchmark for the approximate similarity of inventories.
+
+Compares matching sounds one by one - calling `Phoneme.similarity` for each pair of sounds -
+with `Inventory.approximate_similarity`, for all pairs of random inventories drawn from the
+sounds of the BIPA transcription system.
+
+Usage:
+    python benchmarks/inventories.py [--repos PATH/TO/clts] [--inventories N] [--size N]
+"""
+import time
+import random
+import argparse
+import pathlib
+import statistics
+
+from pyclts import CLTS
+from pyclts.inventories import Inventory, _approximate
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).parent.parent / 'tests' / 'repos')
+    parser.add_argument('--inventories', type=int, default=20)
+    parser.add_argument('--size', type=int, default=80)
+    args = parser.parse_args(args)
+
+    bipa = CLTS(args.repos).bipa
+    sounds = [name for name in sorted(bipa._names) if bipa[name].type != 'marker']
+    random.seed(42)
+    inventories = [
+        Inventory.from_list(*random.sample(sounds, args.size), ts=bipa)
+        for _ in range(args.inventories)]
+    print('{0} inventories of {1} sounds'.format(args.inventories, args.size))
+
+    def one_by_one(a, b):
+        a, b = list(a.sounds.values()), list(b.sounds.values())
+        return statistics.mean([_approximate(a, b), _approximate(b, a)])
+
+    for name, func in [
+        ('one by one', one_by_one),
+        ('greedy', lambda a, b: a.approximate_similarity(b)),
+        ('optimal', lambda a, b: a.approximate_similarity(b, method='optimal')),
+    ]:
+        start = time.time()
+        for a in inventories:
+            for b in inventories:
+                func(a, b)
+        print('{0:<12} {1:.4f}s'.format(name, time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Memory benchmark for the sound objects of pyclts.
+
+Compares the memory used by sounds with the layout of `pyclts.models` (attributes stored in
+slots) to the memory used by equivalent objects storing their attributes in a per-instance
+`__dict__`, for
+- all sounds of the BIPA transcription system and
+- a resolution cache holding many distinct sound objects.
+
+Usage:
+    python benchmarks/memory.py [--repos PATH/TO/clts] [--sounds N]
+"""
+import gc
+import argparse
+import pathlib
+import tracemalloc
+
+import attr
+
+from pyclts import CLTS
+
+_DICT_LAYOUT = {}
+
+
+def dict_layout(cls):
+    """
+    A class storing the attributes of `cls` in a per-instance `__dict__`.
+    """
+    if cls not in _DICT_LAYOUT:
+        _DICT_LAYOUT[cls] = type(cls.__name__, (object,), {})
+    return _DICT_LAYOUT[cls]
+
+
+def copy(sound, slots=True):
+    """
+    A frozen copy of `sound` - as returned by a transcription system - with the derived values \
+    cached on frozen sounds computed.
+    """
+    res = type(sound)(**{
+        f.name: getattr(sound, f.name) for f in attr.fields(type(sound)) if f.init})._freeze()
+    res.name, str(res), getattr(res, 'bitmask', None)
+    if slots:
+        return res
+    obj = dict_layout(type(sound))()
+    obj.__dict__.update((f.name, getattr(res, f.name)) for f in attr.fields(type(sound)))
+    return obj
+
+
+def measure(func):
+    gc.collect()
+    tracemalloc.start()
+    res = func()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del res
+    gc.collect()
+    return size
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).parent.parent / 'tests' / 'repos')
+    parser.add_argument('--sounds', type=int, default=1000000)
+    args = parser.parse_args(args)
+
+    bipa = CLTS(args.repos).bipa
+    sounds = list(bipa.sounds.values())
+    # Generated sounds make up most of a resolution cache for real data.
+    cached = [s for s in bipa.resolve_many([
+        s.grapheme + d for s in sounds for d in ['ʰ', 'ː', 'ʷ', 'ʲ']]) if s.type != 'unknownsound']
+
+    print('{0:<40} {1:>15} {2:>15}'.format('', '__slots__', '__dict__'))
+    print('{0:<40} {1:>15,} {2:>15,}'.format(
+        'BIPA sounds ({0})'.format(len(sounds)),
+        *[measure(lambda: [copy(s, slots=slots) for s in sounds]) for slots in [True, False]]))
+    print('{0:<40} {1:>15,} {2:>15,}'.format(
+        'Resolution cache ({0:,} sounds)'.format(args.sounds),
+        *[measure(lambda: [copy(cached[i % len(cached)], slots=slots)
+                           for i in range(args.sounds)]) for slots in [True, False]]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark for the normalization of graphemes in transcription systems.
+
+Compares `TranscriptionSystem.normalize` with normalization by character-wise lookup in the
+normalization mapping, for all graphemes in the transcription data and sources of a CLTS
+repository.
+
+Usage:
+    python benchmarks/normalize.py [--repos PATH/TO/clts] [--repeat N]
+"""
+import timeit
+import argparse
+import pathlib
+import unicodedata
+
+from csvw.dsv import reader
+
+from pyclts import CLTS
+
+
+def iter_graphemes(api):
+    for p in sorted(api.transcriptiondata_dir.glob('*.tsv')):
+        for row in reader(p, delimiter='\t', dicts=True):
+            yield row['GRAPHEME']
+    for _, rows in api.iter_sources():
+        for row in rows:
+            yield row['GRAPHEME']
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).parent.parent / 'tests' / 'repos')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args(args)
+
+    api = CLTS(args.repos)
+    bipa = api.bipa
+    graphemes = list(iter_graphemes(api))
+
+    def lookup():
+        for g in graphemes:
+            ''.join([bipa._normalize.get(x, x) for x in unicodedata.normalize('NFD', g)])
+
+    def translate():
+        for g in graphemes:
+            bipa.normalize(g)
+
+    print('{0:,} graphemes, {1} repetitions'.format(len(graphemes), args.repeat))
+    for name, func in [('lookup', lookup), ('translate', translate)]:
+        print('{0:<10} {1:.4f}s'.format(name, timeit.timeit(func, number=args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""
+Benchmark for the computation of pairwise sound similarities.
+
+Compares calling `Sound.similarity` for all pairs of sounds with computing the similarity
+matrix from the feature matrix of the sounds, for the sounds of the BIPA transcription system
+(plus generated sounds, if requested).
+
+Usage:
+    python benchmarks/similarity.py [--repos PATH/TO/clts] [--generated]
+"""
+import time
+import argparse
+import pathlib
+
+from pyclts import CLTS
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument(
+        '--repos',
+        type=pathlib.Path,
+        default=pathlib.Path(__file__).parent.parent / 'tests' / 'repos')
+    parser.add_argument('--generated', action='store_true', default=False)
+    parser.add_argument('--tile-size', type=int, default=1024)
+    args = parser.parse_args(args)
+
+    bipa = CLTS(args.repos).bipa
+    sounds = [bipa._names[name] for name in sorted(bipa._names)]
+    if args.generated:
+        sounds.extend(s for s in bipa.resolve_many([
+            s.grapheme + d for s in sounds if s.type != 'marker' for d in ['ʰ', 'ː', 'ʷ', 'ʲ']])
+            if s.type != 'unknownsound')
+    sounds = [s for s in sounds if s.type != 'marker']
+    print('{0:,} sounds'.format(len(sounds)))
+
+    start = time.time()
+    for a in sounds:
+        for b in sounds:
+            a.similarity(b)
+    print('{0:<10} {1:.4f}s'.format('pairwise', time.time() - start))
+
+    start = time.time()
+    bipa.feature_matrix(sounds).similarity(tile_size=args.tile_size)
+    print('{0:<10} {1:.4f}s'.format('matrix', time.time() - start))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,5 @@
+import hashlib
+import pathlib
 import functools
 
 from clldutils.apilib import API
@@ -7,11 +9,16 @@ from cldfcatalog import Config
 from pybtex.database import parse_string
 
 from pyclts import TranscriptionData, TranscriptionSystem, SoundClasses
-from pyclts.soundclasses import SOUNDCLASS_SYSTEMS
+from pyclts.soundclasses import SOUNDCLASS_SYSTEMS, SoundClassConverter
 
 
 class CLTS(API):
-    def __init__(self, repos=None):
+    def __init__(self, repos=None, cache_dir=None):
+        """
+        :param cache_dir: Directory to store snapshots of compiled transcription systems in. \
+        Snapshots are re-used as long as the data they were compiled from does not change, which \
+        cuts the time to load a transcription system considerably.
+        """
         if repos is None:
             repos = Config.from_file().get_clone('clts')  # pragma: no cover
         super().__init__(repos)
@@ -19,6 +26,8 @@ class CLTS(API):
         self.transcriptionsystems_dir = self.pkg_dir / 'transcriptionsystems'
         self.transcriptiondata_dir = self.pkg_dir / 'transcriptiondata'
         self.soundclasses_dir = self.pkg_dir / 'soundclasses'
+        self.cache_dir = pathlib.Path(cache_dir) if cache_dir else None
+        self._transcriptionsystems = {}
 
     @functools.cached_property
     def bipa(self):
@@ -59,8 +68,11 @@ class CLTS(API):
                 yield TranscriptionData(td, self.bipa)
 
     def iter_soundclass(self):
+        # All sound class systems are read from the same table, so we read it only once.
+        path = self.soundclasses_dir / 'lingpy.tsv'
+        rows = list(reader(path, delimiter='\t', dicts=True))
         for sc in SOUNDCLASS_SYSTEMS:
-            yield SoundClasses(self.soundclasses_dir / 'lingpy.tsv', self.bipa, sc)
+            yield SoundClasses(path, self.bipa, sc, rows=rows)
 
     def iter_transcriptionsystem(self, include_private=False, exclude=None):
         exclude = exclude or []
@@ -68,24 +80,53 @@ class CLTS(API):
             if ts.is_dir():
                 if (not ts.name.startswith('_')) or include_private:
                     if ts.name not in exclude:
-                        yield TranscriptionSystem(
-                            ts,
-                            self.transcriptionsystems_dir / 'transcription-system-metadata.json',
-                            self.transcriptionsystems_dir / 'features.json',
-                        )
+                        if ts.name not in self._transcriptionsystems:
+                            self._transcriptionsystems[ts.name] = \
+                                self._load_transcriptionsystem(ts)
+                        yield self._transcriptionsystems[ts.name]
+
+    def _load_transcriptionsystem(self, path):
+        args = (
+            pathlib.Path(path),
+            self.transcriptionsystems_dir / 'transcription-system-metadata.json',
+            self.transcriptionsystems_dir / 'features.json',
+        )
+        if self.cache_dir is None or not args[0].is_dir():
+            return TranscriptionSystem(*args)
+
+        key = TranscriptionSystem.snapshot_key(*args)
+        # Systems with the same name at different locations must not share a snapshot:
+        snapshot = self.cache_dir / '{0}-{1}.snapshot'.format(
+            args[0].name,
+            hashlib.md5(str(args[0].resolve()).encode('utf8')).hexdigest()[:10])
+        ts = TranscriptionSystem.from_snapshot(snapshot, key)
+        if ts is None:
+            ts = TranscriptionSystem(*args)
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                ts.to_snapshot(snapshot, key)
+            except OSError:
+                # Snapshots are just a cache, so a read-only or full cache_dir is not an error.
+                pass
+        else:
+            # The snapshot may have been compiled from the data referenced by another path.
+            ts.path, ts._metadata = args[0], args[1]
+        return ts
 
     @functools.cached_property
     def transcriptionsystem_dict(self):
         return {ts.id: ts for ts in self.iter_transcriptionsystem()}
 
     def transcriptionsystem(self, key):
-        if key in self.transcriptionsystem_dict:
-            return self.transcriptionsystem_dict[key]
-        return TranscriptionSystem(
-            key,
-            self.transcriptionsystems_dir / 'transcription-system-metadata.json',
-            self.transcriptionsystems_dir / 'features.json',
-        )
+        if key in self._transcriptionsystems:
+            return self._transcriptionsystems[key]
+        if isinstance(key, str) and not key.startswith('_') \
+                and self.transcriptionsystems_dir.joinpath(key).is_dir():
+            # Load just the requested system, rather than all systems in the repository.
+            self._transcriptionsystems[key] = self._load_transcriptionsystem(
+                self.transcriptionsystems_dir / key)
+            return self._transcriptionsystems[key]
+        return self._load_transcriptionsystem(key)
 
     @functools.cached_property
     def transcriptiondata_dict(self):
@@ -102,3 +143,10 @@ class CLTS(API):
 
     def soundclass(self, key):
         return self.soundclasses_dict[key]
+
+    def soundclass_converter(self, *keys):
+        """
+        :param keys: IDs of sound class systems; all systems if none are given.
+        :return: `SoundClassConverter` instance.
+        """
+        return SoundClassConverter([self.soundclass(key) for key in keys or SOUNDCLASS_SYSTEMS])
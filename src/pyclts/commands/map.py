@@ -45,10 +45,10 @@ def run(args, test=False):
         else:
             sound = bipa[raw_grapheme]
             if sound.type == "unknownsound":
-                match = list(bipa._regex.finditer(raw_grapheme))
+                match = bipa._matches(bipa._longest_matches(raw_grapheme), limit=3)
                 if len(match) == 2:
-                    sound1 = bipa[raw_grapheme[:match[1].start()]]
-                    sound2 = bipa[raw_grapheme[match[1].start():]]
+                    sound1 = bipa[raw_grapheme[:match[1][0]]]
+                    sound2 = bipa[raw_grapheme[match[1][0]:]]
                     if sound1.type == "consonant" and sound2.type == "consonant":
                         # check for prenasalized stuff
                         if sound1.manner == "nasal" and (
@@ -0,0 +1,197 @@
+"""
+One-hot encoding of the features of sounds as matrix.
+"""
+import json
+import pathlib
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+try:
+    from scipy import sparse as sp
+except ImportError:  # pragma: no cover
+    sp = None
+
+__all__ = ['FeatureMatrix']
+
+
+class FeatureMatrix(object):
+    """
+    A matrix of sounds by feature values, with cell (i, j) set to 1 if sound i has feature j.
+
+    :ivar rows: `list` of row labels, i.e. the names of the sounds (or the grapheme for sounds \
+    without name, like unknown sounds).
+    :ivar columns: `list` of column labels, i.e. feature values. Sound types (e.g. "consonant") \
+    are included as feature values.
+    :ivar data: The matrix as `numpy` array or - if sparse - `scipy.sparse.csr_matrix`.
+    """
+    def __init__(self, rows, columns, data):
+        assert data.shape == (len(rows), len(columns))
+        self.rows = list(rows)
+        self.columns = list(columns)
+        self.data = data
+
+    @property
+    def sparse(self):
+        return not isinstance(self.data, np.ndarray)
+
+    def __len__(self):
+        return len(self.rows)
+
+    @classmethod
+    def from_sounds(cls, sounds, ts, sparse=False, dtype='uint8'):
+        """
+        :param sounds: Iterable of sound objects of transcription system `ts`.
+        :param sparse: Flag signaling whether to store the matrix as sparse matrix.
+
+        Columns are ordered by the bit positions used in `Sound.bitmask`, i.e. the matrix is the \
+        "unpacked" bitmask of the sounds.
+        """
+        if np is None:  # pragma: no cover
+            raise ImportError('Feature matrices require numpy.')
+        if sparse and sp is None:  # pragma: no cover
+            raise ImportError('Sparse feature matrices require scipy.')
+        rows, masks = [], []
+        for sound in sounds:
+            rows.append(getattr(sound, 'name', None) or str(sound))
+            if getattr(sound, 'type', None) in (None, 'unknownsound', 'marker'):
+                masks.append(0)
+            else:
+                # The bitmask is cached for sounds of `ts`, otherwise the features of the sound
+                # are added to the feature vocabulary of `ts`:
+                masks.append(sound.bitmask if sound.ts is ts else ts.bitmask(sound.featureset))
+        columns = [None] * len(ts.feature_bits)
+        for feature, bit in ts.feature_bits.items():
+            columns[bit] = feature
+
+        # Unpack the bitmasks into rows of 0s and 1s:
+        nbytes = len(columns) // 8 + 1
+        data = np.unpackbits(
+            np.frombuffer(
+                b''.join(mask.to_bytes(nbytes, 'little') for mask in masks), dtype=np.uint8,
+            ).reshape(len(rows), nbytes),
+            axis=1,
+            bitorder='little',
+        )[:, :len(columns)].astype(dtype)
+        if sparse:
+            data = sp.csr_matrix(data)
+        return cls(rows, columns, data)
+
+    def todense(self):
+        return self.data.toarray() if self.sparse else self.data
+
+    def _rows(self, start, end):
+        rows = self.data[start:end]
+        return (rows.toarray() if self.sparse else np.asarray(rows)).astype(np.float64)
+
+    def _weights(self, weights, columns):
+        """
+        :param weights: `dict` mapping feature values to weights - with a default weight of 1 - \
+        or sequence of weights per column.
+        """
+        if weights is None:
+            return np.ones(len(columns))
+        if isinstance(weights, dict):
+            return np.array([float(weights.get(c, 1)) for c in columns])
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != (len(columns),):
+            raise ValueError('Expected {0} weights, got {1}'.format(len(columns), len(weights)))
+        return weights
+
+    def iter_similarity(self, other=None, weights=None, tile_size=1024, distance=False):
+        """
+        Compute the (weighted) Jaccard similarity of all pairs of sounds in tiles.
+
+        Without weights, the similarities are the same as computed by `Sound.similarity` for \
+        sounds of the same transcription system. Sounds without features (i.e. unknown sounds \
+        and markers) have similarity 0 to all sounds.
+
+        :param other: `FeatureMatrix` with the sounds to compare to; defaults to `self`. Its \
+        columns must be a prefix of the columns of `self` or vice versa, which is the case for \
+        feature matrices of the same transcription system.
+        :param weights: Feature weights, see `FeatureMatrix._weights`.
+        :param tile_size: Maximal number of rows and columns of each tile.
+        :param distance: Flag signaling whether to compute distances, i.e. 1 - similarity.
+        :return: Generator of triples (row offset, column offset, tile), where tile is a \
+        `numpy` array of similarities of the sounds `self.rows[row offset:]` with the sounds \
+        `other.rows[column offset:]`.
+        """
+        other = self if other is None else other
+        columns = max(self.columns, other.columns, key=len)
+        if columns[:min(len(self.columns), len(other.columns))] != \
+                min(self.columns, other.columns, key=len):
+            raise ValueError('Feature matrices with incompatible columns')
+        w = self._weights(weights, columns)
+        # The weighted size of the feature sets of all sounds:
+        size, other_size = self.data @ w[:len(self.columns)], other.data @ w[:len(other.columns)]
+
+        for i in range(0, len(self), tile_size):
+            x = self._rows(i, i + tile_size) * w[:len(self.columns)]
+            for j in range(0, len(other), tile_size):
+                y = other._rows(j, j + tile_size)
+                ncols = min(x.shape[1], y.shape[1])
+                intersection = x[:, :ncols] @ y[:, :ncols].T
+                union = size[i:i + tile_size, None] + other_size[None, j:j + tile_size] \
+                    - intersection
+                res = np.divide(
+                    intersection, union, out=np.zeros_like(intersection), where=union > 0)
+                yield i, j, 1 - res if distance else res
+
+    def similarity(self, other=None, weights=None, tile_size=1024, distance=False,
+                   dtype='float32'):
+        """
+        The matrix of similarities of all pairs of sounds, see `FeatureMatrix.iter_similarity`.
+        """
+        other = self if other is None else other
+        res = np.empty((len(self), len(other)), dtype=dtype)
+        for i, j, tile in self.iter_similarity(
+                other=other, weights=weights, tile_size=tile_size, distance=distance):
+            res[i:i + tile.shape[0], j:j + tile.shape[1]] = tile
+        return res
+
+    def save(self, fname):
+        """
+        Save the matrix to `fname`.
+
+        Dense matrices are saved in NumPy's `.npy` format - with the labels in a `.json` file \
+        next to it - and can be loaded as memory-mapped array. Sparse matrices are saved in \
+        (uncompressed) `.npz` format, including the labels.
+        """
+        fname = pathlib.Path(fname)
+        if self.sparse:
+            data = self.data.tocsr()
+            np.savez(
+                fname.with_suffix('.npz'),
+                data=data.data,
+                indices=data.indices,
+                indptr=data.indptr,
+                shape=np.array(data.shape),
+                rows=np.array(self.rows, dtype=str),
+                columns=np.array(self.columns, dtype=str))
+        else:
+            np.save(fname.with_suffix('.npy'), self.data)
+            fname.with_suffix('.json').write_text(
+                json.dumps(dict(rows=self.rows, columns=self.columns), ensure_ascii=False),
+                encoding='utf8')
+
+    @classmethod
+    def load(cls, fname, mmap_mode='r'):
+        """
+        :param mmap_mode: Passed into `numpy.load` to memory-map a dense matrix.
+        """
+        fname = pathlib.Path(fname)
+        if fname.suffix == '.npz':
+            with np.load(fname) as npz:
+                return cls(
+                    npz['rows'].tolist(),
+                    npz['columns'].tolist(),
+                    sp.csr_matrix(
+                        (npz['data'], npz['indices'], npz['indptr']),
+                        shape=tuple(npz['shape'])))
+        labels = json.loads(fname.with_suffix('.json').read_text(encoding='utf8'))
+        return cls(
+            labels['rows'],
+            labels['columns'],
+            np.load(fname.with_suffix('.npy'), mmap_mode=mmap_mode))
@@ -1,36 +1,133 @@
 """
 Module handles different aspects of inventory comparison.
 """
+import json
+import hashlib
+import pathlib
 import argparse
+import functools
 import statistics
 import collections
+import concurrent.futures
+from types import MappingProxyType
 
 import attr
 from clldutils.clilib import Table
+from pycldf import Dataset
 
 from pyclts.api import CLTS
 from pyclts.util import jaccard
+from pyclts.models import cmp_off
+
+# numpy, scipy and the feature matrices based on them are slow to import - and optional - so
+# they are imported only in the functions using them.
+
+DEFAULT_FEATURES = {
+    "consonant": ["phonation", "place", "manner"],
+    "vowel": ["roundedness", "height", "centrality"],
+    "tone": ["start"],
+}
+
+
+@functools.lru_cache(maxsize=None)
+def default_ts():
+    """
+    The default transcription system BIPA - loaded only once.
+    """
+    return CLTS().bipa
 
 
 def reduce_features(sound, ts=None, features=None):
-    ts = ts or CLTS().bipa
-    features = features or {
-        "consonant": ["phonation", "place", "manner"],
-        "vowel": ["roundedness", "height", "centrality"],
-        "tone": ["start"],
-    }
-    sound_ = ts[sound] if isinstance(sound, str) else sound
-    if sound_.type in ["cluster", "diphthong"]:
-        return reduce_features(sound_.from_sound, ts=ts, features=features)
-    name = "{} {}".format(
-        " ".join(
-            [s for s in [sound_.featuredict.get(x) for x in features[sound_.type]] if s]
-        ),
-        sound_.type,
-    )
-    if sound_.type != "tone":
-        return ts[name]
-    return ts["short " + " ".join(name.split(" "))]
+    return Reducer.get(ts or default_ts(), features)(sound)
+
+
+class Reducer:
+    """
+    Reduce sounds to sounds specified only by a subset of their features.
+
+    Reduced sounds are cached by sound name. Use `Reducer.get` to retrieve the shared reducer
+    for a transcription system and feature specification - which is stored on the system, so
+    it lives as long as the system.
+
+    :param features: `dict` mapping sound types to the list of features to keep.
+    """
+    def __init__(self, ts=None, features=None):
+        self.ts = ts or default_ts()
+        self.features = features or DEFAULT_FEATURES
+        self.table = {}
+
+    @classmethod
+    def get(cls, ts=None, features=None):
+        ts = ts or default_ts()
+        key = tuple(sorted((k, tuple(v)) for k, v in (features or DEFAULT_FEATURES).items()))
+        if key not in ts._reducers:
+            ts._reducers[key] = cls(ts, features)
+        return ts._reducers[key]
+
+    def __call__(self, sound):
+        """
+        :raises KeyError: If the feature specification does not cover the type of the sound.
+        """
+        sound = self.ts[sound] if isinstance(sound, str) else sound
+        res = self.table.get(sound.name)
+        if res is None:
+            res = self._reduce(sound)
+            if sound.name is not None:
+                self.table[sound.name] = res
+        return res
+
+    def _reduce(self, sound):
+        if sound.type in ["cluster", "diphthong"]:
+            return self(sound.from_sound)
+        name = "{} {}".format(
+            " ".join(
+                [s for s in [sound.featuredict.get(x) for x in self.features[sound.type]] if s]
+            ),
+            sound.type,
+        )
+        if sound.type != "tone":
+            return self.ts[name]
+        return self.ts["short " + " ".join(name.split(" "))]
+
+    def reduce_many(self, sounds, default=None):
+        """
+        Reduce a sequence of sounds.
+
+        :param default: Value to return for sounds which can not be reduced.
+        """
+        res = []
+        for sound in sounds:
+            try:
+                res.append(self(sound))
+            except KeyError:
+                res.append(default)
+        return res
+
+    def reduce_inventory(self, inventory):
+        """
+        Reduce the sounds of an inventory, merging sounds with the same reduced sound.
+
+        Sounds which can not be reduced - e.g. markers - are kept unchanged.
+
+        :return: New `Inventory` instance.
+        """
+        sounds = Sounds()
+        phonemes = list(inventory.sounds.values())
+        for phoneme, sound in zip(
+                phonemes, self.reduce_many([p.sound for p in phonemes])):
+            sound = sound or phoneme.sound
+            if str(sound) in sounds:
+                sounds[str(sound)].graphemes_in_source.extend(phoneme.graphemes_in_source or [])
+                sounds[str(sound)].occs.extend(phoneme.occs or [])
+            else:
+                sounds[str(sound)] = Phoneme(
+                    grapheme=str(sound),
+                    graphemes_in_source=list(phoneme.graphemes_in_source or []),
+                    occs=list(phoneme.occs or []),
+                    sound=sound,
+                )
+        return Inventory(
+            id=inventory.id, language=inventory.language, sounds=sounds, ts=self.ts)
 
 
 class GetAttributeFromSound:
@@ -70,17 +167,72 @@ class Phoneme:
         return 0
 
 
+class Sounds(collections.OrderedDict):
+    """
+    The sounds of an inventory, keeping track of modifications to invalidate cached views.
+    """
+
+    def __init__(self, *args, **kw):
+        self.version = 0
+        collections.OrderedDict.__init__(self, *args, **kw)
+
+    def __setitem__(self, key, value):
+        self.version += 1
+        collections.OrderedDict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self.version += 1
+        collections.OrderedDict.__delitem__(self, key)
+
+    def pop(self, *args):
+        self.version += 1
+        return collections.OrderedDict.pop(self, *args)
+
+    def popitem(self, last=True):
+        self.version += 1
+        return collections.OrderedDict.popitem(self, last=last)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def clear(self):
+        self.version += 1
+        collections.OrderedDict.clear(self)
+
+    def move_to_end(self, key, last=True):
+        self.version += 1
+        collections.OrderedDict.move_to_end(self, key, last=last)
+
+
+def _sounds(sounds):
+    """
+    Sounds of an inventory are stored as `Sounds` - so a `dict` passed in is copied, while a \
+    `Sounds` instance is kept.
+    """
+    return sounds if sounds is None or isinstance(sounds, Sounds) else Sounds(sounds)
+
+
 class GetSubInventoryByType:
     def __init__(self, types):
-        def select_sounds(inventory):
+        def select_sounds(obj):
+            if len(types) == 1:
+                return obj._partition().get(types[0], collections.OrderedDict())
             return collections.OrderedDict(
-                [(k, v) for k, v in inventory.items() if v.type in types]
+                [(k, v) for k, v in obj.sounds.items() if v.type in types]
             )
 
         self.select_sounds = select_sounds
 
+    def __set_name__(self, owner, name):
+        self.name = name
+
     def __get__(self, obj, objtype=None):
-        return self.select_sounds(obj.sounds)
+        if obj is None:
+            return self
+        # Cached views are shared, so they are only handed out read-only:
+        return MappingProxyType(obj._view(self.name, lambda: self.select_sounds(obj)))
 
 
 class GetSubInventoryByProperty(GetSubInventoryByType):
@@ -89,8 +241,13 @@ class GetSubInventoryByProperty(GetSubInventoryByType):
         self.properties = properties
 
     def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        return MappingProxyType(obj._view(self.name, lambda: self.select_by_property(obj)))
+
+    def select_by_property(self, obj):
         out = collections.OrderedDict()
-        sounds = self.select_sounds(obj.sounds)
+        sounds = self.select_sounds(obj)
         for k, v in sounds.items():
             stripped = obj.ts.features.get(
                 frozenset([s for s in v.featureset if s not in self.properties])
@@ -106,8 +263,10 @@ class GetSubInventoryByProperty(GetSubInventoryByType):
 class Inventory:
     id = attr.ib(default=None)
     language = attr.ib(default=None)
-    sounds = attr.ib(default=None, repr=False)
+    sounds = attr.ib(default=None, repr=False, converter=_sounds)
     ts = attr.ib(default=None, repr=False)
+    # Sub-inventories by name, valid for a version of `sounds`.
+    _views = attr.ib(factory=dict, init=False, repr=False, **cmp_off)
 
     consonants = GetSubInventoryByType(["consonant"])
     consonants_by_quality = GetSubInventoryByProperty(
@@ -128,24 +287,78 @@ class Inventory:
 
     @classmethod
     def from_list(cls, *list_of_sounds, id=None, language=None, ts=None):
-        ts = ts or CLTS().bipa
-        sounds = collections.OrderedDict()
-        for itm in list_of_sounds:
-            sound = ts[itm]
+        ts = ts or default_ts()
+        return cls._from_sounds(
+            [(itm, ts[itm], None) for itm in list_of_sounds], id=id, language=language, ts=ts)
+
+    @classmethod
+    def _from_sounds(cls, items, id=None, language=None, ts=None):
+        """
+        :param items: Iterable of triples (grapheme in source, sound, occurrence), where \
+        occurrence is added to `Phoneme.occs` unless it is `None`.
+        """
+        sounds, partition = Sounds(), collections.defaultdict(collections.OrderedDict)
+        for itm, sound, occ in items:
             try:
-                sounds[str(sound)].graphemes_in_source.append(itm)
+                phoneme = sounds[str(sound)]
+                phoneme.graphemes_in_source.append(itm)
             except KeyError:
-                sounds[str(sound)] = Phoneme(
+                phoneme = sounds[str(sound)] = partition[sound.type][str(sound)] = Phoneme(
                     grapheme=str(sound),
                     graphemes_in_source=[sound.grapheme],
                     occs=[],
                     sound=sound,
                 )
-        return cls(sounds=sounds, ts=ts, language=language, id=id)
+            if occ is not None:
+                phoneme.occs.append(occ)
+        res = cls(sounds=sounds, ts=ts, language=language, id=id)
+        res._view("_partition", lambda: partition)
+        return res
+
+    def _view(self, name, compute):
+        """
+        Retrieve a sub-inventory from the cache - or compute and cache it.
+        """
+        version = getattr(self.sounds, "version", None)
+        if version is None:  # Modifications of `sounds` can not be detected.
+            return compute()
+        if self._views.get("_sounds") is not self.sounds or self._views["_version"] != version:
+            self._views.clear()
+            self._views.update(_sounds=self.sounds, _version=version)
+        if name not in self._views:
+            self._views[name] = compute()
+        return self._views[name]
+
+    def _partition(self):
+        """
+        The sounds of the inventory, partitioned by type.
+        """
+        def partition():
+            res = collections.defaultdict(collections.OrderedDict)
+            for k, v in self.sounds.items():
+                res[v.type][k] = v
+            return res
+
+        return self._view("_partition", partition)
 
     def __len__(self):
         return len(self.sounds)
 
+    def fingerprint(self, aspect="sounds"):
+        """
+        A hash over the sorted names of the sounds of an aspect of the inventory.
+
+        Inventories with the same sounds - irrespective of their order and of the graphemes \
+        used in the source - have the same fingerprint.
+
+        :param aspect: The aspect of the inventory, e.g. "consonants" or "vowels_by_quality".
+        """
+        def fingerprint():
+            names = sorted(p.name or p.grapheme for p in getattr(self, aspect).values())
+            return hashlib.md5("\n".join(names).encode("utf8")).hexdigest()
+
+        return self._view("_fingerprint_" + aspect, fingerprint)
+
     def tabulate(self, format="pipe", types=None):
         types = types or ["sounds"]
         table = []
@@ -173,36 +386,566 @@ class Inventory:
                 scores += [jaccard(soundsA, soundsB)]
         return statistics.mean(scores) if scores else 0
 
-    def approximate_similarity(self, other, aspects=None):
-        aspects = aspects or ["sounds"]
+    def approximate_similarity(self, other, aspects=None, method="greedy"):
+        """
+        Similarity of two inventories, matching similar - rather than only identical - sounds.
 
-        def approximate(soundsA, soundsB):
-            matches = []
-            for soundA in soundsA:
-                best_match, best_sim = None, 0
-                for soundB in soundsB:
-                    current_sim = soundA.similarity(soundB)
-                    if current_sim > best_sim:
-                        best_match = soundB
-                        best_sim = current_sim
-                if best_match is not None:
-                    matches += [best_sim]
-                    soundsB = [s for s in soundsB if s != best_match]
-            matches += [0 for s in soundsB]
-            return statistics.mean(matches)
+        :param method: The method to match sounds; either "greedy", matching each sound to the \
+        most similar sound of the other inventory which has not been matched yet, in the order \
+        of the sounds in the inventory, or "optimal", matching sounds such that the sum of \
+        similarities of matched sounds is maximal.
+        """
+        aspects = aspects or ["sounds"]
+        _check_matching(method)
 
         scores = []
         for aspect in aspects:
             soundsA, soundsB = (
-                getattr(self, aspect).values(),
-                getattr(other, aspect).values(),
+                list(getattr(self, aspect).values()),
+                list(getattr(other, aspect).values()),
             )
             if soundsA and soundsB:
-                scores += [
-                    statistics.mean(
-                        [approximate(soundsA, soundsB), approximate(soundsB, soundsA)]
-                    )
-                ]
+                try:
+                    import numpy  # noqa: F401
+                except ImportError:  # pragma: no cover
+                    scores += [
+                        statistics.mean(
+                            [_approximate(soundsA, soundsB), _approximate(soundsB, soundsA)]
+                        )
+                    ]
+                    continue
+                # The similarities of all pairs of sounds are computed once, for both directions.
+                scores += [_match(self._similarity_matrix(soundsA, soundsB), method)]
             elif soundsA or soundsB:
                 scores += [0]
         return statistics.mean(scores) if scores else 0
+
+    def _similarity_matrix(self, soundsA, soundsB):
+        """
+        The matrix of similarities of pairs of phonemes, as computed by `Phoneme.similarity`.
+        """
+        import numpy as np
+        from pyclts.featurematrix import FeatureMatrix
+
+        ts = self.ts or soundsA[0].sound.ts
+        res = FeatureMatrix.from_sounds([s.sound for s in soundsA], ts).similarity(
+            FeatureMatrix.from_sounds([s.sound for s in soundsB], ts), dtype=np.float64)
+        # Markers and unknown sounds are only similar to identical phonemes:
+        for i, soundA in enumerate(soundsA):
+            if soundA.type in ["marker", "unknownsound"]:
+                res[i] = [soundA.similarity(soundB) for soundB in soundsB]
+        return res
+
+
+class InventoryCollection:
+    """
+    A collection of inventories, supporting comparison of all pairs of inventories.
+    """
+
+    def __init__(self, inventories, ts=None):
+        self.inventories = list(inventories)
+        self.ts = ts or (self.inventories[0].ts if self.inventories else None)
+
+    @classmethod
+    def from_rows(
+        cls, rows, ts=None, language="Language_ID", value="Value", inventory=None, id="ID",
+        workers=None,
+    ):
+        """
+        Load inventories from rows of a table, e.g. a CLDF ValueTable, in one pass.
+
+        Each distinct grapheme is resolved only once for all inventories.
+
+        :param rows: Iterable of `dict`s.
+        :param language: Name of the column holding the language of an inventory.
+        :param value: Name of the column holding the graphemes.
+        :param inventory: Name of the column identifying inventories; defaults to `language`, \
+        i.e. assuming one inventory per language.
+        :param id: Name of the column holding the row ID - added to `Phoneme.occs` of the sound. \
+        If the column does not exist, the row number is used.
+        :param workers: Number of processes to spread the resolution of graphemes over.
+        """
+        ts = ts or default_ts()
+        inventory = inventory or language
+        inventories = collections.OrderedDict()
+        for i, row in enumerate(rows):
+            if not row[value]:
+                continue
+            key = row[inventory]
+            if key not in inventories:
+                inventories[key] = (row[language], [])
+            inventories[key][1].append((row[value], row.get(id, i)))
+
+        graphemes = list({g for _, items in inventories.values() for g, _ in items})
+        resolved = dict(zip(graphemes, ts.resolve_many(graphemes, workers=workers)))
+        return cls([
+            Inventory._from_sounds(
+                [(g, resolved[g], occ) for g, occ in items], id=key, language=lang, ts=ts)
+            for key, (lang, items) in inventories.items()], ts=ts)
+
+    @classmethod
+    def from_cldf(cls, dataset, ts=None, inventory=None, workers=None):
+        """
+        Load inventories from the ValueTable of a CLDF dataset.
+
+        :param dataset: `pycldf.Dataset` or path to the metadata file of a dataset.
+        :param inventory: Name of the column identifying inventories, e.g. "Contribution_ID"; \
+        defaults to the language reference, i.e. one inventory per language.
+        """
+        if not isinstance(dataset, Dataset):
+            dataset = Dataset.from_metadata(dataset)
+        return cls.from_rows(
+            dataset.iter_rows("ValueTable", "id", "languageReference", "value"),
+            ts=ts,
+            language="languageReference",
+            value="value",
+            inventory=inventory,
+            id="id",
+            workers=workers,
+        )
+
+    def __len__(self):
+        return len(self.inventories)
+
+    def __iter__(self):
+        return iter(self.inventories)
+
+    def __getitem__(self, i):
+        return self.inventories[i]
+
+    def group_by_fingerprint(self, aspect="sounds"):
+        """
+        Group inventories with identical sounds.
+
+        :return: `OrderedDict` mapping fingerprints (see `Inventory.fingerprint`) to lists of \
+        indices of inventories in the collection, in the order of first occurrence.
+        """
+        res = collections.OrderedDict()
+        for i, inventory in enumerate(self):
+            res.setdefault(inventory.fingerprint(aspect), []).append(i)
+        return res
+
+    def deduplicate(self, aspect="sounds"):
+        """
+        :return: New `InventoryCollection` with only the first of each group of inventories \
+        with identical sounds.
+        """
+        return InventoryCollection(
+            [self[indices[0]] for indices in self.group_by_fingerprint(aspect).values()],
+            ts=self.ts)
+
+    def similarity_matrix(
+        self, aspects=None, method="strict", matching="greedy", workers=None, distance=False
+    ):
+        """
+        Compute the similarities of all pairs of inventories in the collection.
+
+        :param method: Either "strict" or "approximate", computing the similarities of pairs \
+        of inventories like `Inventory.strict_similarity` or `Inventory.approximate_similarity`.
+        :param matching: The method to match sounds for approximate similarity.
+        :param workers: Number of processes to spread the computation of approximate \
+        similarities over.
+        :param distance: Flag signaling whether to compute distances, i.e. 1 - similarity.
+        :return: Condensed similarity matrix, i.e. a `numpy` array with the similarities of \
+        the pairs of inventories (i, j) with i < j, ordered by i and j - like the result of \
+        `scipy.spatial.distance.pdist`.
+        """
+        aspects = aspects or ["sounds"]
+        if method == "strict":
+            res = self._strict_similarity_matrix(aspects)
+        elif method == "approximate":
+            _check_matching(matching)
+            res = self._approximate_similarity_matrix(aspects, matching, workers)
+        else:
+            raise ValueError("Unknown method: {0}".format(method))
+        return 1 - res if distance else res
+
+    def _strict_similarity_matrix(self, aspects, block_size=1024):
+        import numpy as np
+        try:
+            from scipy import sparse as sp
+        except ImportError:  # pragma: no cover
+            raise ImportError("Computing similarity matrices requires scipy.")
+
+        n = len(self)
+        scores, counts = np.zeros(n * (n - 1) // 2), np.zeros(n * (n - 1) // 2)
+        for aspect in aspects:
+            # Encode the inventories as rows of a sparse matrix of inventories by sounds:
+            index, rows, cols = {}, [], []
+            for i, inventory in enumerate(self):
+                for sound in getattr(inventory, aspect):
+                    rows.append(i)
+                    cols.append(index.setdefault(sound, len(index)))
+            matrix = sp.csr_matrix(
+                (np.ones(len(rows)), (rows, cols)), shape=(n, len(index)))
+            sizes = np.asarray(matrix.sum(axis=1)).ravel()
+            for start in range(0, n, block_size):
+                intersection = (matrix[start:start + block_size] @ matrix.T).toarray()
+                union = sizes[start:start + block_size, None] + sizes[None, :] - intersection
+                for i in range(start, min(start + block_size, n)):
+                    pos = _condensed_index(n, i, i + 1)
+                    inter, uni = intersection[i - start, i + 1:], union[i - start, i + 1:]
+                    # Aspects for which both inventories have no sounds are skipped:
+                    counts[pos:pos + n - i - 1] += uni > 0
+                    scores[pos:pos + n - i - 1] += np.divide(
+                        inter, uni, out=np.zeros_like(inter), where=uni > 0)
+        return np.divide(scores, counts, out=np.zeros_like(scores), where=counts > 0)
+
+    def _approximate_similarity_matrix(self, aspects, matching, workers):
+        import numpy as np
+
+        n = len(self)
+        res = np.zeros(n * (n - 1) // 2)
+        if n < 2:  # There are no pairs of inventories - and possibly no system to encode sounds.
+            return res
+        state = [self._encode(aspect) for aspect in aspects]
+        if workers and workers > 1:
+            # Rows are distributed round-robin, to balance the number of pairs per chunk.
+            nchunks = min(n, workers * 4)
+            chunks = [list(range(k, n, nchunks)) for k in range(nchunks)]
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(state,)
+            ) as executor:
+                results = executor.map(
+                    _approximate_rows_in_worker, chunks, [matching] * len(chunks))
+                for chunk, scores in zip(chunks, results):
+                    for i, row in zip(chunk, scores):
+                        res[_condensed_index(n, i, i + 1):_condensed_index(n, i + 1, i + 2)] = row
+        else:
+            for i, row in zip(range(n), _approximate_rows(state, range(n), matching)):
+                res[_condensed_index(n, i, i + 1):_condensed_index(n, i + 1, i + 2)] = row
+        return res
+
+    def _encode(self, aspect):
+        """
+        Encode the sounds of all inventories for one aspect against a shared index of sounds.
+
+        :return: triple (features, indices, identities), where `features` is the feature matrix \
+        of all distinct sounds, `indices` lists the rows of the sounds of each inventory in \
+        `features` and `identities` lists for each sound of each inventory a number identifying \
+        markers and unknown sounds - which are only similar to identical phonemes - or -1.
+        """
+        import numpy as np
+        from pyclts.featurematrix import FeatureMatrix
+
+        index, sounds, phonemes, indices, identities = {}, [], [], [], []
+        for inventory in self:
+            idx, ids = [], []
+            for key, phoneme in getattr(inventory, aspect).items():
+                if key not in index:
+                    index[key] = len(sounds)
+                    sounds.append(phoneme.sound)
+                idx.append(index[key])
+                if phoneme.type in ["marker", "unknownsound"]:
+                    for k, other in enumerate(phonemes):
+                        if other == phoneme:
+                            ids.append(k)
+                            break
+                    else:
+                        ids.append(len(phonemes))
+                        phonemes.append(phoneme)
+                else:
+                    ids.append(-1)
+            indices.append(np.array(idx, dtype=np.intp))
+            identities.append(np.array(ids, dtype=np.intp))
+        return FeatureMatrix.from_sounds(sounds, self.ts), indices, identities
+
+
+class CompactInventoryCollection:
+    """
+    A collection of inventories stored in arrays, like a sparse matrix in CSR format.
+
+    The sounds of inventory i are `sounds[indices[indptr[i]:indptr[i + 1]]]`, and the graphemes
+    in source and occurrences of the phonemes are stored likewise. `Inventory` objects are only
+    created when accessed.
+    """
+    MAGIC = b"PYCLTSIC"
+
+    def __init__(self, arrays, tables, ts=None):
+        """
+        :param arrays: `dict` of `numpy` arrays, see `CompactInventoryCollection.from_inventories`.
+        :param tables: `dict` of `list`s of strings, see \
+        `CompactInventoryCollection.from_inventories`.
+        """
+        self.arrays, self.tables = arrays, tables
+        self._ts = ts
+        self._sounds = {}
+
+    @property
+    def ts(self):
+        if self._ts is None:
+            self._ts = default_ts()
+        return self._ts
+
+    @classmethod
+    def from_inventories(cls, inventories, ts=None):
+        import numpy as np
+
+        tables = {name: [] for name in ["ids", "languages", "sounds", "graphemes", "occs"]}
+        index = {name: {} for name in tables}
+        lists = collections.defaultdict(list)
+
+        def idx(table, item):
+            if item not in index[table]:
+                index[table][item] = len(tables[table])
+                tables[table].append(item)
+            return index[table][item]
+
+        for inventory in inventories:
+            ts = ts or inventory.ts
+            tables["ids"].append(inventory.id)
+            tables["languages"].append(inventory.language)
+            lists["indptr"].append(len(lists["indices"]))
+            for key, phoneme in inventory.sounds.items():
+                lists["indices"].append(idx("sounds", key))
+                lists["graphemes_indptr"].append(len(lists["graphemes"]))
+                lists["graphemes"].extend(
+                    idx("graphemes", g) for g in phoneme.graphemes_in_source or [])
+                lists["occs_indptr"].append(len(lists["occs"]))
+                lists["occs"].extend(idx("occs", occ) for occ in phoneme.occs or [])
+        lists["indptr"].append(len(lists["indices"]))
+        lists["graphemes_indptr"].append(len(lists["graphemes"]))
+        lists["occs_indptr"].append(len(lists["occs"]))
+        return cls({
+            name: np.array(lists[name], dtype=np.int64 if "indptr" in name else np.int32)
+            for name in
+            ["indptr", "indices", "graphemes_indptr", "graphemes", "occs_indptr", "occs"]
+        }, tables, ts=ts)
+
+    def __len__(self):
+        return len(self.tables["ids"])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def sound(self, j):
+        """
+        The sound object for sound j of the shared sound table.
+        """
+        if j not in self._sounds:
+            self._sounds[j] = self.ts[self.tables["sounds"][j]]
+        return self._sounds[j]
+
+    def _index(self, i):
+        """
+        Normalize the index of an inventory like a `list` would - counting negative indices \
+        from the end.
+        """
+        n = len(self)
+        if not -n <= i < n:
+            raise IndexError("Inventory index out of range: {0}".format(i))
+        return i + n if i < 0 else i
+
+    def sound_indices(self, i):
+        """
+        The indices of the sounds of inventory i in the shared sound table.
+        """
+        i = self._index(i)
+        return self.arrays["indices"][self.arrays["indptr"][i]:self.arrays["indptr"][i + 1]]
+
+    def __getitem__(self, i):
+        """
+        :return: `Inventory` instance for inventory i.
+        """
+        i = self._index(i)
+        a, t = self.arrays, self.tables
+        sounds, partition = Sounds(), collections.defaultdict(collections.OrderedDict)
+        for k in range(a["indptr"][i], a["indptr"][i + 1]):
+            sound, key = self.sound(a["indices"][k]), t["sounds"][a["indices"][k]]
+            sounds[key] = partition[sound.type][key] = Phoneme(
+                grapheme=key,
+                graphemes_in_source=[
+                    t["graphemes"][j] for j in
+                    a["graphemes"][a["graphemes_indptr"][k]:a["graphemes_indptr"][k + 1]]],
+                occs=[
+                    t["occs"][j] for j in a["occs"][a["occs_indptr"][k]:a["occs_indptr"][k + 1]]],
+                sound=sound,
+            )
+        res = Inventory(id=t["ids"][i], language=t["languages"][i], sounds=sounds, ts=self.ts)
+        res._view("_partition", lambda: partition)
+        return res
+
+    def to_collection(self):
+        return InventoryCollection(list(self), ts=self.ts)
+
+    def save(self, fname):
+        """
+        Save the collection to a binary file.
+
+        The file starts with a JSON header - holding the ID of the transcription system, the
+        tables of strings and the positions of the arrays in the file - followed by the arrays,
+        so the arrays can be memory-mapped.
+        """
+        import numpy as np
+
+        header, offset, offsets = dict(ts=self.ts.id, tables=self.tables, arrays={}), 0, []
+        for name, array in self.arrays.items():
+            # Each array starts at a multiple of 64 bytes, so all arrays are aligned:
+            offset += -offset % 64
+            offsets.append(offset)
+            header["arrays"][name] = [array.dtype.str, offset, len(array)]
+            offset += array.nbytes
+        header = json.dumps(header, ensure_ascii=False).encode("utf8")
+        # Pad the header, so the data section starts aligned, too:
+        header += b" " * (-(len(self.MAGIC) + 8 + len(header)) % 64)
+        with pathlib.Path(fname).open("wb") as f:
+            f.write(self.MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            start = f.tell()
+            for offset, array in zip(offsets, self.arrays.values()):
+                f.write(b"\0" * (start + offset - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+
+    @classmethod
+    def load(cls, fname, ts=None, mmap=True):
+        """
+        :param ts: The transcription system the collection was saved with; defaults to BIPA.
+        :param mmap: Flag signaling whether to memory-map the arrays, rather than reading them.
+        :raises ValueError: If the collection was saved with another transcription system.
+        """
+        import numpy as np
+
+        fname = pathlib.Path(fname)
+        with fname.open("rb") as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError("Not an inventory collection file: {0}".format(fname))
+            size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(size).decode("utf8"))
+        # Sounds are stored as strings, which must be resolved with the same system - where the
+        # default system BIPA is only loaded when needed:
+        ts_id = ts.id if ts else "bipa"
+        if header.get("ts", ts_id) != ts_id:
+            raise ValueError("{0} was saved with transcription system {1}, not {2}".format(
+                fname, header["ts"], ts_id))
+        start, arrays = len(cls.MAGIC) + 8 + size, {}
+        for name, (dtype, offset, length) in header["arrays"].items():
+            if mmap and length:
+                arrays[name] = np.memmap(
+                    fname, dtype=dtype, mode="r", offset=start + offset, shape=(length,))
+            else:
+                with fname.open("rb") as f:
+                    f.seek(start + offset)
+                    arrays[name] = np.frombuffer(
+                        f.read(length * np.dtype(dtype).itemsize), dtype=dtype)
+        return cls(arrays, header["tables"], ts=ts)
+
+
+def _condensed_index(n, i, j):
+    """
+    The position of the pair (i, j) of n items, with i < j, in a condensed matrix.
+    """
+    return n * i - i * (i + 1) // 2 + j - i - 1
+
+
+_state = None
+
+
+def _init_worker(state):
+    global _state
+    _state = state
+
+
+def _approximate_rows_in_worker(rows, matching):
+    return _approximate_rows(_state, rows, matching)
+
+
+def _approximate_rows(state, rows, matching):
+    """
+    Compute approximate similarities of inventory i with inventories j > i, for i in `rows`.
+    """
+    import numpy as np
+    from pyclts.featurematrix import FeatureMatrix
+
+    res, n = [], len(state[0][1])
+    for i in rows:
+        scores = np.zeros((len(state), n - i - 1))
+        counts = np.zeros((len(state), n - i - 1))
+        for k, (features, indices, identities) in enumerate(state):
+            # Similarities of the sounds of inventory i with all sounds in the index:
+            similarities = FeatureMatrix(
+                indices[i].tolist(), features.columns, features.data[indices[i]],
+            ).similarity(features, dtype=np.float64)
+            for j in range(i + 1, n):
+                if len(indices[i]) and len(indices[j]):
+                    matrix = similarities[:, indices[j]]
+                    special = identities[i] >= 0
+                    matrix[special] = identities[i][special, None] == identities[j][None, :]
+                    scores[k, j - i - 1] = _match(matrix, matching)
+                if len(indices[i]) or len(indices[j]):
+                    counts[k, j - i - 1] = 1
+        # Average over aspects like `Inventory.approximate_similarity`:
+        res.append([
+            statistics.mean(scores[counts[:, m] > 0, m].tolist()) if counts[:, m].any() else 0
+            for m in range(n - i - 1)])
+    return res
+
+
+def _check_matching(method):
+    if method not in ("greedy", "optimal"):
+        raise ValueError("Unknown method: {0}".format(method))
+    if method == "optimal":
+        try:
+            from scipy.optimize import linear_sum_assignment  # noqa: F401
+        except ImportError:  # pragma: no cover
+            raise ImportError("Optimal matching of sounds requires scipy.")
+
+
+def _match(matrix, method):
+    """
+    Match sounds in both directions, given the matrix of similarities of pairs of sounds.
+    """
+    match = _match_greedy if method == "greedy" else _match_optimal
+    return statistics.mean([match(matrix), match(matrix.T)])
+
+
+def _approximate(soundsA, soundsB):
+    matches = []
+    for soundA in soundsA:
+        best_match, best_sim = None, 0
+        for soundB in soundsB:
+            current_sim = soundA.similarity(soundB)
+            if current_sim > best_sim:
+                best_match = soundB
+                best_sim = current_sim
+        if best_match is not None:
+            matches += [best_sim]
+            soundsB = [s for s in soundsB if s != best_match]
+    matches += [0 for s in soundsB]
+    return statistics.mean(matches)
+
+
+def _match_greedy(matrix):
+    """
+    Match the rows of a similarity matrix to the most similar column which hasn't been matched \
+    yet, one row after the other.
+
+    :return: The mean of the similarities of matched pairs and 0 for each unmatched column.
+    """
+    import numpy as np
+
+    matches, available = [], [True] * matrix.shape[1]
+    # Columns by descending similarity per row, with ties ordered by column index - so the
+    # first available column in this order is the first of the most similar available columns.
+    for row, order in zip(matrix.tolist(), np.argsort(-matrix, axis=1, kind="stable").tolist()):
+        for j in order:
+            if available[j]:
+                if row[j] > 0:
+                    matches += [row[j]]
+                    available[j] = False
+                break
+    return statistics.mean(matches + [0] * sum(available))
+
+
+def _match_optimal(matrix):
+    """
+    Match rows and columns of a similarity matrix, maximizing the sum of similarities.
+
+    :return: Like `_match_greedy`.
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    rows, cols = linear_sum_assignment(matrix, maximize=True)
+    matches = [float(matrix[i, j]) for i, j in zip(rows, cols) if matrix[i, j] > 0]
+    return statistics.mean(matches + [0] * (matrix.shape[1] - len(matches)))
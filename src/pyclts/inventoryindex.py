@@ -0,0 +1,188 @@
+"""
+Index for similarity search over inventories, using MinHash signatures with LSH banding.
+"""
+import json
+import hashlib
+import pathlib
+import collections
+
+from pyclts.featurematrix import np
+from pyclts.inventories import reduce_features
+from pyclts.util import jaccard
+
+__all__ = ['InventoryIndex']
+
+# Modulus of the hash functions, a Mersenne prime larger than all hash values.
+PRIME = (1 << 61) - 1
+
+
+def sound_names(inventory, aspect='sounds'):
+    """
+    The names of the sounds of an inventory - or the graphemes of sounds without name.
+    """
+    return {p.name or p.grapheme for p in getattr(inventory, aspect).values()}
+
+
+def reduced_sound_names(inventory, aspect='sounds'):
+    """
+    The names of the sounds of an inventory, reduced to the basic features (see \
+    `reduce_features`).
+    """
+    res = set()
+    for p in getattr(inventory, aspect).values():
+        try:
+            res.add(reduce_features(p.sound, ts=inventory.ts).name or p.grapheme)
+        except KeyError:  # Markers, unknown sounds, etc.
+            res.add(p.name or p.grapheme)
+    return res
+
+
+TOKENIZERS = {'names': sound_names, 'reduced': reduced_sound_names}
+
+
+class InventoryIndex(object):
+    """
+    An index of inventories, to find the inventories most similar to a given inventory.
+
+    Inventories are represented as sets of tokens - sound names or reduced sound names. The
+    Jaccard similarity of these sets is estimated from MinHash signatures of the inventories.
+    Candidates for similar inventories are looked up in the buckets of the bands of the
+    signatures (locality-sensitive hashing), and then ranked by their actual similarity.
+
+    :param tokens: Either "names" or "reduced" - the name of a function in `TOKENIZERS`.
+    :param aspect: The aspect of inventories to compare, e.g. "sounds" or "consonants".
+    :param num_perm: Number of hash functions, i.e. the length of the signatures.
+    :param bands: Number of bands of the signatures. With r = num_perm / bands rows per band, \
+    inventories with similarity s are candidates with probability 1 - (1 - s^r)^bands.
+    """
+    def __init__(self, tokens='names', aspect='sounds', num_perm=128, bands=32, seed=1):
+        if np is None:  # pragma: no cover
+            raise ImportError('InventoryIndex requires numpy.')
+        if tokens not in TOKENIZERS:
+            raise ValueError('Unknown tokens: {0}'.format(tokens))
+        if num_perm % bands:
+            raise ValueError('num_perm must be a multiple of bands')
+        self.tokens, self.aspect, self.num_perm, self.bands, self.seed = \
+            tokens, aspect, num_perm, bands, seed
+        rng = np.random.RandomState(seed)
+        # Parameters of the hash functions (a * x + b) % PRIME, chosen such that the result of
+        # the multiplication of a with a 32-bit hash value does not overflow.
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._hashes = {}
+        self.keys = []
+        self.token_sets = []
+        self._signatures = []
+        self._buckets = [collections.defaultdict(list) for _ in range(bands)]
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def signatures(self):
+        """
+        `numpy` array of the signatures of the indexed inventories.
+        """
+        if isinstance(self._signatures, list):
+            self._signatures = np.array(self._signatures, dtype=np.uint64).reshape(
+                (len(self._signatures), self.num_perm))
+        return self._signatures
+
+    def _hash(self, token):
+        res = self._hashes.get(token)
+        if res is None:
+            res = self._hashes[token] = int.from_bytes(
+                hashlib.blake2b(token.encode('utf8'), digest_size=4).digest(), 'little')
+        return res
+
+    def signature(self, tokens):
+        """
+        The MinHash signature of a set of tokens.
+        """
+        if not tokens:
+            return np.full(self.num_perm, PRIME, dtype=np.uint64)
+        hashes = np.array([self._hash(t) for t in tokens], dtype=np.uint64)
+        return ((hashes[:, None] * self._a + self._b) % np.uint64(PRIME)).min(axis=0)
+
+    def _band_keys(self, signature):
+        rows = self.num_perm // self.bands
+        return [signature[i * rows:(i + 1) * rows].tobytes() for i in range(self.bands)]
+
+    def _tokenize(self, inventory):
+        return frozenset(TOKENIZERS[self.tokens](inventory, aspect=self.aspect))
+
+    def insert(self, inventory, key=None):
+        """
+        Add an inventory to the index.
+
+        :param key: Key to identify the inventory in query results; defaults to the ID of the \
+        inventory.
+        """
+        self._add(inventory.id if key is None else key, self._tokenize(inventory))
+
+    def _add(self, key, tokens, signature=None):
+        if signature is None:
+            signature = self.signature(tokens)
+        i = len(self.keys)
+        self.keys.append(key)
+        self.token_sets.append(tokens)
+        if not isinstance(self._signatures, list):
+            self._signatures = list(self._signatures)
+        self._signatures.append(signature)
+        if tokens:
+            for bucket, band in zip(self._buckets, self._band_keys(signature)):
+                bucket[band].append(i)
+
+    def query(self, inventory, k=10):
+        """
+        Find the indexed inventories most similar to `inventory`.
+
+        :return: `list` of up to `k` pairs (key, similarity), ordered by descending Jaccard \
+        similarity of the tokens of the inventories. Only inventories sharing a band with \
+        `inventory` are considered, so similar inventories may be missed - with a probability \
+        depending on their similarity and the banding parameters.
+        """
+        tokens = self._tokenize(inventory)
+        if not tokens:
+            return []
+        candidates = set()
+        for bucket, band in zip(self._buckets, self._band_keys(self.signature(tokens))):
+            candidates.update(bucket.get(band, []))
+        res = sorted(
+            ((jaccard(tokens, self.token_sets[i]), i) for i in candidates),
+            key=lambda x: (-x[0], x[1]))
+        return [(self.keys[i], score) for score, i in res[:k]]
+
+    def save(self, fname):
+        """
+        Save the index as uncompressed `.npz` file.
+
+        Keys of inventories are saved as JSON, so they must be JSON serializable.
+        """
+        meta = dict(
+            tokens=self.tokens,
+            aspect=self.aspect,
+            num_perm=self.num_perm,
+            bands=self.bands,
+            seed=self.seed,
+            keys=self.keys,
+            token_sets=[sorted(t) for t in self.token_sets])
+        np.savez(
+            pathlib.Path(fname),
+            signatures=self.signatures,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)))
+
+    @classmethod
+    def load(cls, fname):
+        with np.load(pathlib.Path(fname)) as npz:
+            meta = json.loads(str(npz['meta']))
+            signatures = npz['signatures']
+        res = cls(
+            tokens=meta['tokens'],
+            aspect=meta['aspect'],
+            num_perm=meta['num_perm'],
+            bands=meta['bands'],
+            seed=meta['seed'])
+        for key, tokens, signature in zip(meta['keys'], meta['token_sets'], signatures):
+            res._add(key, frozenset(tokens), signature=signature)
+        return res
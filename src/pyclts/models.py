@@ -4,7 +4,7 @@ import unicodedata
 import attr
 from clldutils.misc import nfilter
 
-from pyclts.util import norm, jaccard
+from pyclts.util import norm, jaccard, bitmask_jaccard
 
 __all__ = [
     'is_valid_sound',
@@ -37,6 +37,24 @@ EXCLUDE_FEATURES = [
 cmp_off = {"eq" if getattr(attr, "__version_info__", (0,)) >= (19, 2) else "cmp": False}
 
 
+def cached(slot):
+    """
+    Decorator caching the result of a method without arguments in `slot` of frozen symbols.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self):
+            if not self._frozen:
+                return func(self)
+            res = getattr(self, slot)
+            if res is None:
+                res = func(self)
+                object.__setattr__(self, slot, res)
+            return res
+        return wrapper
+    return decorator
+
+
 def is_valid_sound(sound, ts):
     """Check the consistency of a given transcription system conversino"""
     if isinstance(sound, (Marker, UnknownSound)):
@@ -46,15 +64,28 @@ def is_valid_sound(sound, ts):
     return s1.name == s2.name and s1.s == s2.s
 
 
-@attr.s(**cmp_off)
+@attr.s(slots=True, **cmp_off)
 class Symbol(object):
     ts = attr.ib()
     grapheme = attr.ib()
     source = attr.ib(default=None)
     generated = attr.ib(default=False, validator=attr.validators.instance_of(bool))
     note = attr.ib(default=None)
+    _frozen = attr.ib(default=False, init=False, repr=False)
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise attr.exceptions.FrozenInstanceError()
+        object.__setattr__(self, name, value)
 
-    @functools.cached_property
+    def _freeze(self):
+        """
+        Make the symbol immutable, allowing derived values to be cached.
+        """
+        object.__setattr__(self, '_frozen', True)
+        return self
+
+    @property
     def type(self):
         return self.__class__.__name__.lower()
 
@@ -88,12 +119,12 @@ class Symbol(object):
         return ' '.join('U+' + ('000' + hex(ord(x))[2:])[-4:] for x in str(self))
 
 
-@attr.s(**cmp_off)
+@attr.s(slots=True, **cmp_off)
 class UnknownSound(Symbol):
     pass
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Sound(Symbol):
     """
     Sound object stores basic features of the individual sound objects.
@@ -103,6 +134,11 @@ class Sound(Symbol):
     normalized = attr.ib(default=None)
     unknown = attr.ib(default=None)
     stress = attr.ib(default=None)
+    # Slots for the derived values cached on frozen sounds:
+    _name = attr.ib(default=None, init=False, repr=False)
+    _featureset = attr.ib(default=None, init=False, repr=False)
+    _bitmask = attr.ib(default=None, init=False, repr=False)
+    _str = attr.ib(default=None, init=False, repr=False)
 
     _name_order = []
     _write_order = dict(pre=[], post=[])
@@ -134,12 +170,24 @@ class Sound(Symbol):
         return {f: getattr(self, f, None) for f in self._name_order}
 
     @property
+    @cached('_featureset')
     def featureset(self):
         return frozenset(self._features() + [self.type])
 
+    @property
+    @cached('_bitmask')
+    def bitmask(self):
+        """
+        The feature set encoded as integer, using the feature vocabulary of the sound's system.
+        """
+        return self.ts.bitmask(self.featureset)
+
     def similarity(self, other):
+        if isinstance(other, Sound) and self.ts is not None and self.ts is other.ts:
+            return bitmask_jaccard(self.bitmask, other.bitmask)
         return jaccard(self.featureset, other.featureset)
 
+    @cached('_str')
     def __str__(self):
         """
         Return the reference representation of the sound.
@@ -159,33 +207,34 @@ class Sound(Symbol):
             raise ValueError(
                 'Orphaned alias {0}'.format(self.grapheme))  # pragma: no cover
 
+        # renderings of generated sounds are shared by all sounds with the same features
+        key = (self.name, self.base)
+        res = self.ts._rendered.get(key)
+        if res is None:
+            res = self.ts._rendered[key] = self._render()
+        return res
+
+    def _render(self):
+        features = self._features()
         # search for best base-string
-        elements = [f for f in self._features() if f not in EXCLUDE_FEATURES] + [self.type]
-        base_str = self.base or '<?>'
-        base_graphemes = []
-        while elements:
-            base = self.ts.features.get(frozenset(elements))
-            if base:
-                base_graphemes.append(base.grapheme)
-            elements.pop(0)
-        base_str = base_graphemes[-1] if base_graphemes else base_str or '<?>'
-        base_vals = {
-            self.ts._feature_values[elm] for elm in
-            self.ts.sounds[base_str].name.split(' ')[:-1]} if \
-            base_str != '<?>' else {}
+        base_str = self.ts._base_grapheme(
+            tuple(f for f in features if f not in EXCLUDE_FEATURES) + (self.type,))
+        base_str = base_str or self.base or '<?>'
+        base_vals = self.ts._base_features(base_str) if base_str != '<?>' else {}
         out = []
         for p in self._write_order['pre']:
-            if p not in base_vals and getattr(self, p, '') in self._features():
+            if p not in base_vals and getattr(self, p, '') in features:
                 out.append(
                     norm(self.ts.features[self.type].get(getattr(self, p, ''), '<!>')))
         out.append(base_str)
         for p in self._write_order['post']:
-            if p not in base_vals and getattr(self, p, '') in self._features():
+            if p not in base_vals and getattr(self, p, '') in features:
                 out.append(
                     norm(self.ts.features[self.type].get(getattr(self, p, ''), '<!>')))
         return ''.join(out)
 
     @property
+    @cached('_name')
     def name(self):
         return ' '.join([f or '' for f in self._features()] + [self.type])
 
@@ -222,12 +271,13 @@ class Sound(Symbol):
         return ' '.join(['◌' + s for s in self.s])
 
 
-@attr.s(**cmp_off)
+@attr.s(slots=True, **cmp_off)
 class Marker(Symbol):
     alias = attr.ib(default=None)
     feature = attr.ib(default=None)
     value = attr.ib(default=None)
     unknown = attr.ib(default=None)
+    normalized = attr.ib(default=None)
 
     @property
     def name(self):
@@ -238,7 +288,7 @@ class Marker(Symbol):
         return frozenset([self.grapheme, self.type])
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Consonant(Sound):
 
     # features follow basic information about IPA from various sources, they
@@ -328,15 +378,23 @@ class Consonant(Sound):
     ]
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class ComplexSound(Sound):
     from_sound = attr.ib(default=None)
     to_sound = attr.ib(default=None)
 
+    def _freeze(self):
+        for sound in [self.from_sound, self.to_sound]:
+            if sound is not None:
+                sound._freeze()
+        return Sound._freeze(self)
+
+    @cached('_str')
     def __str__(self):
         return str(self.from_sound) + str(self.to_sound)
 
     @property
+    @cached('_name')
     def name(self):
         n1 = ' '.join(self.from_sound.name.split(' ')[:-1])
         n2 = ' '.join(self.to_sound.name.split(' ')[:-1])
@@ -378,7 +436,7 @@ class ComplexSound(Sound):
         return [self.grapheme, self.from_sound.name, self.to_sound.name]
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Cluster(ComplexSound):
     """
     A cluster of two consonants whose manner is either plosive or implosive.
@@ -391,7 +449,7 @@ class Cluster(ComplexSound):
     """
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Vowel(Sound):
     roundedness = attr.ib(default=None)
     height = attr.ib(default=None)
@@ -447,14 +505,14 @@ class Vowel(Sound):
         'tone']
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Diphthong(ComplexSound):
     """
     A dipthong consists of two vowels.
     """
 
 
-@attr.s(repr=False, **cmp_off)
+@attr.s(repr=False, slots=True, **cmp_off)
 class Tone(Sound):
     contour = attr.ib(default=None)
     start = attr.ib(default=None)
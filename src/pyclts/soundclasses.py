@@ -1,7 +1,8 @@
-from pyclts.transcriptionsystem import Symbol
-from pyclts.util import read_data, TranscriptionBase
+from pyclts.transcriptionsystem import Symbol, CACHE_SIZE
+from pyclts.util import read_data, TranscriptionBase, LRUCache
 
 SOUNDCLASS_SYSTEMS = ['sca', 'cv', 'art', 'dolgo', 'asjp', 'color']
+MISSING = object()
 
 
 class SoundClasses(TranscriptionBase):
@@ -10,36 +11,48 @@ class SoundClasses(TranscriptionBase):
     """
     __type__ = 'sc'
 
-    def __init__(self, path, system, id_):
+    def __init__(self, path, system, id_, rows=None):
         assert id_ in SOUNDCLASS_SYSTEMS
         super().__init__(path, system)
         self._id = id_
-        _, data, self.sounds, self.names = read_data(self.path, self._id)
+        _, data, self.sounds, self.names = read_data(self.path, self._id, rows=rows)
         self.data = {}
         self.classes = set()
         for k, v in data.items():
             self.data[k] = v[0]
             self.classes.add(v[0]['grapheme'])
 
+        # sound classes by sound name, `None` if no sound class can be determined
+        self._by_name = {}
+        # sound classes for all graphemes of the transcription system ...
+        self._by_grapheme = {g: self._resolve(s) for g, s in self.system.sounds.items()}
+        # ... and for other strings which have been converted.
+        self._cache = LRUCache(CACHE_SIZE)
+
     @property
     def id(self):
         return self._id
 
-    def resolve_sound(self, sound):
-        """Function tries to identify a sound in the data.
+    def _vocabulary_items(self):
+        return sorted(self.classes)
 
-        Notes
-        -----
-        The function tries to resolve sounds to take a sound with less complex
-        features in order to yield the next approximate sound class, if the
-        transcription data are sound classes.
+    def _resolve(self, sound):
         """
-        sound = sound if isinstance(sound, Symbol) else self.system[sound]
+        Determine the sound class for a sound.
+
+        :return: The sound class or `None`.
+        """
+        res = self._by_name.get(sound.name, MISSING)
+        if res is MISSING:
+            res = self._by_name[sound.name] = self._find_class(sound)
+        return res
+
+    def _find_class(self, sound):
         if sound.name in self.data:
             return self.data[sound.name]['grapheme']
         if not sound.type == 'unknownsound':
             if sound.type in ['diphthong', 'cluster']:
-                return self.resolve_sound(sound.from_sound)
+                return self._resolve(sound.from_sound)
             name = [
                 s for s in sound.name.split(' ') if
                 self.system._feature_values.get(s, '') not in
@@ -47,6 +60,93 @@ class SoundClasses(TranscriptionBase):
             while len(name) >= 4:
                 sound = self.system.get(' '.join(name))
                 if sound and sound.name in self.data:
-                    return self.resolve_sound(sound)
+                    return self._resolve(sound)
                 name.pop(0)
-        raise KeyError(":sc:resolve_sound: No sound could be found.")
+        return None
+
+    def _lookup(self, sound):
+        if isinstance(sound, Symbol):
+            return self._resolve(sound)
+        res = self._by_grapheme.get(sound, MISSING)
+        if res is MISSING:
+            res = self._cache.get(sound, MISSING)
+            if res is MISSING:
+                res = self._cache[sound] = self._resolve(self.system[sound])
+        return res
+
+    def resolve_sound(self, sound):
+        """Function tries to identify a sound in the data.
+
+        Notes
+        -----
+        The function tries to resolve sounds to take a sound with less complex
+        features in order to yield the next approximate sound class, if the
+        transcription data are sound classes.
+        """
+        res = self._lookup(sound)
+        if res is None:
+            raise KeyError(":sc:resolve_sound: No sound could be found.")
+        return res
+
+    def get(self, sound, default=None):
+        res = self._lookup(sound)
+        return default if res is None else res
+
+    def convert(self, sounds, default='0'):
+        """
+        Convert a sequence of sounds to sound classes.
+
+        :param sounds: Iterable of sounds or a string of space-separated sounds.
+        :param default: Value to return for sounds which can not be converted.
+        """
+        if isinstance(sounds, str):
+            sounds = sounds.split()
+        return [self.get(sound, default=default) for sound in sounds]
+
+
+class SoundClassConverter:
+    """
+    Convert sounds to multiple sound class systems at once.
+
+    Each sound is resolved only once in the transcription system shared by the sound class
+    systems, and the classes for all systems are looked up from the resolved sound.
+    """
+    def __init__(self, soundclasses):
+        self.soundclasses = list(soundclasses)
+        assert self.soundclasses
+        self.system = self.soundclasses[0].system
+        assert all(sc.system is self.system for sc in self.soundclasses)
+        # Tuples of sound classes (or `None`) by grapheme.
+        self._cache = LRUCache(CACHE_SIZE)
+
+    @property
+    def ids(self):
+        return [sc.id for sc in self.soundclasses]
+
+    def classes(self, sound):
+        """
+        :return: `tuple` of sound classes - or `None` if no class can be determined - in the \
+        order of `SoundClassConverter.ids`.
+        """
+        if isinstance(sound, Symbol):
+            return tuple(sc._resolve(sound) for sc in self.soundclasses)
+        res = self._cache.get(sound)
+        if res is None:
+            res = self._cache[sound] = self.classes(self.system[sound])
+        return res
+
+    def convert(self, sounds, default='0'):
+        """
+        Convert a sequence of sounds to sound classes of all systems.
+
+        :param sounds: Iterable of sounds or a string of space-separated sounds.
+        :param default: Value to return for sounds which can not be converted.
+        :return: `dict` mapping sound class system IDs to lists of sound classes.
+        """
+        if isinstance(sounds, str):
+            sounds = sounds.split()
+        res = [[] for _ in self.soundclasses]
+        for sound in sounds:
+            for i, cls in enumerate(self.classes(sound)):
+                res[i].append(default if cls is None else cls)
+        return dict(zip(self.ids, res))
@@ -41,5 +41,8 @@ class TranscriptionData(TranscriptionBase):
             return '//'.join([x['grapheme'] for x in self.data[sound.name]])
         raise KeyError(":td:resolve_sound: No sound could be found.")
 
+    def _vocabulary_items(self):
+        return sorted({'//'.join([x['grapheme'] for x in self.data[name]]) for name in self.names})
+
     def resolve_grapheme(self, grapheme):
         return self.system[self.grapheme_map[grapheme]]
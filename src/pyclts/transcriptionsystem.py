@@ -3,31 +3,43 @@ Transcription System module for consistent IPA handling.
 ========================================================
 
 """
-import re
+import os
+import pickle
+import pathlib
 
 from csvw import TableGroup
 from clldutils import jsonlib
 import attr
 
-from pyclts.util import nfd, norm, EMPTY, itertable, TranscriptionBase
+from pyclts.util import (
+    nfd, norm, EMPTY, itertable, content_hash, LRUCache, TranscriptionBase,
+)
 from pyclts.models import *  # noqa: F403
 
+# Version of the on-disk snapshot format. Must be incremented whenever the pickled state of
+# transcription systems or sounds changes incompatibly.
+SNAPSHOT_VERSION = 12
+# Default number of resolved graphemes kept in the cache of a transcription system.
+CACHE_SIZE = 10000
+
 
 class TranscriptionSystem(TranscriptionBase):
     """
     A transcription System."""
     __type__ = 'ts'
 
-    def __init__(self, path, metadata, features):
+    def __init__(self, path, metadata, features, cache_size=CACHE_SIZE):
         """
         :param system: The name of a transcription system or a directory containing one.
+        :param cache_size: Maximal number of resolved strings to keep in `self.cache`.
         """
         super().__init__(path, None)
         if not (self.path.exists() and self.path.is_dir()):
             raise ValueError('unknown system: {0}'.format(self.path))
 
+        self._metadata = pathlib.Path(metadata)
         self.system = TableGroup.from_file(metadata)
-        self.system._fname = path / 'metadata.json'
+        self.system._fname = self.path / 'metadata.json'
 
         self.features = {'consonant': {}, 'vowel': {}, 'tone': {}}
         # dictionary for feature values, checks when writing elements from
@@ -49,6 +61,7 @@ class TranscriptionSystem(TranscriptionBase):
         self.sound_classes = {}
         self.columns = {}  # the basic column structure, to allow for rendering
         self.sounds = {}  # Sounds by grapheme
+        self._names = {}  # Sounds by name
         self._covered = {}
         # check for unresolved aliased sounds
         aliases = []
@@ -67,7 +80,7 @@ class TranscriptionSystem(TranscriptionBase):
                 if item['grapheme'] in self.sounds:
                     raise ValueError('duplicate grapheme in {0}:{1}: {2}'.format(
                         type_ + 's.tsv', lnum + 2, item['grapheme']))  # pragma: no cover
-                sound = cls(ts=self, **item)
+                sound = cls(ts=self, **item)._freeze()
                 # make sure this does not take too long
                 for key, value in item.items():
                     if key not in {'grapheme', 'note', 'alias'} and \
@@ -84,6 +97,7 @@ class TranscriptionSystem(TranscriptionBase):
                         raise ValueError('duplicate features in {0}:{1}: {2}'.format(
                             type_ + 's.tsv', lnum + 2, sound.name))
                     self.features[sound.featureset] = sound
+                    self._names[sound.name] = sound
                 else:
                     aliases += [(lnum, sound.type, sound.featureset)]
         # check for consistency of aliases: if an alias has no counterpart, it
@@ -96,35 +110,178 @@ class TranscriptionSystem(TranscriptionBase):
             raise ValueError(
                 'Orphaned aliases in line(s) {0}'.format(error))
 
-        # basic regular expression, used to match the basic sounds in the system.
-        self._regex = None
-        self._update_regex()
+        # prefix tree of the graphemes of the basic sounds in the system, used to match them.
+        self._trie = None
+        self._update_trie()
 
         # normalization data
         self._normalize = {
             norm(r['source']): norm(r['target'])
             for r in itertable(self.system.tabledict['normalize.tsv'])}
+        # Normalization replaces single characters, so we can compile it into a translation table.
+        self._normalize_table = str.maketrans(
+            {k: v for k, v in self._normalize.items() if len(k) == 1})
+
+        # vocabulary of feature values, assigning each value a bit position in the bitmask
+        # representation of feature sets (see `TranscriptionSystem.bitmask`)
+        values = set(self._feature_values) | {v for f in features.values()
+                                              for vals in f.values() for v in vals}
+        values |= {'{0}_{1}'.format(p, v) for p in ['from', 'to'] for v in values}
+        values |= set(self.sound_classes) | {'diphthong', 'cluster', 'unknownsound'}
+        self.feature_bits = {v: i for i, v in enumerate(sorted(values))}
+
+        # cache of resolved sounds, keyed by the input string
+        self.cache = LRUCache(cache_size)
+        # sounds parsed from names other than the names of the sounds in `self._names`
+        self._name_cache = LRUCache(cache_size)
+        # words which mark a string as name of a sound
+        self._name_types = frozenset(list(self.sound_classes) + ['diphthong', 'cluster'])
+        # renderings of generated sounds, keyed by name and base grapheme
+        self._rendered = LRUCache(cache_size)
+        # base graphemes for rendering generated sounds, keyed by feature tuple
+        self._base_graphemes = {}
+        # features specified by basic sounds, keyed by grapheme
+        self._base_feature_sets = {}
+        # reducers of sounds to subsets of their features (see `pyclts.inventories.Reducer`)
+        self._reducers = {}
+
+    @property
+    def system(self):
+        # The table group is not part of a snapshot, thus we re-read it when needed.
+        if self._system is None:
+            self._system = TableGroup.from_file(self._metadata)
+            self._system._fname = self.path / 'metadata.json'
+        return self._system
+
+    @system.setter
+    def system(self, value):
+        self._system = value
+
+    def __getstate__(self):
+        state = TranscriptionBase.__getstate__(self)
+        state['_system'] = None
+        state['cache'] = LRUCache(self.cache.maxsize)
+        state['_rendered'] = LRUCache(self._rendered.maxsize)
+        state['_name_cache'] = LRUCache(self._name_cache.maxsize)
+        state['_reducers'] = {}
+        return state
+
+    def _systems(self):
+        return [self]
+
+    @staticmethod
+    def snapshot_key(path, metadata, features):
+        """
+        Checksum identifying the data a transcription system is compiled from.
+        """
+        return '{0}-{1}'.format(
+            SNAPSHOT_VERSION, content_hash(path, metadata, features))
+
+    def to_snapshot(self, fname, key):
+        """
+        Write the compiled transcription system to a snapshot file.
+
+        :param key: Checksum as computed by `TranscriptionSystem.snapshot_key`.
+        """
+        fname = pathlib.Path(fname)
+        tmp = fname.parent / '{0}.{1}.tmp'.format(fname.name, os.getpid())
+        with tmp.open('wb') as fp:
+            pickle.dump(key, fp, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(self, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        # Replacing the file is atomic, so concurrent readers never see a partial snapshot.
+        os.replace(str(tmp), str(fname))
+
+    @classmethod
+    def from_snapshot(cls, fname, key):
+        """
+        Load a transcription system from a snapshot file.
 
-    def _update_regex(self):
-        self._regex = re.compile('|'.join(
-            map(re.escape, sorted(self.sounds, key=lambda x: (len(x),
-                -ord(x[0])), reverse=True))))
+        :param key: Checksum as computed by `TranscriptionSystem.snapshot_key`.
+        :return: `TranscriptionSystem` instance or `None`, if the snapshot does not exist or \
+        is stale.
+
+        .. note:: Snapshots are pickles, so they must only be read from trusted locations.
+        """
+        fname = pathlib.Path(fname)
+        if not fname.exists():
+            return None
+        try:
+            with fname.open('rb') as fp:
+                if pickle.load(fp) != key:
+                    return None
+                res = pickle.load(fp)
+        except Exception:  # pragma: no cover
+            # Snapshots written by incompatible versions of pyclts are treated as stale.
+            return None
+        return res if isinstance(res, cls) else None
+
+    def _update_trie(self):
+        self._trie = {}
+        for grapheme in self.sounds:
+            node = self._trie
+            for char in grapheme:
+                node = node.setdefault(char, {})
+            # graphemes are stored under the key None of the node for their last character
+            node[None] = grapheme
+
+    def _longest_matches(self, string):
+        """
+        Determine the longest grapheme of a basic sound starting at each position of a string.
+
+        :return: `list` with the end position of the longest match at each position or `None`.
+        """
+        res = []
+        for i in range(len(string)):
+            node, end = self._trie, None
+            for j in range(i, len(string)):
+                node = node.get(string[j])
+                if node is None:
+                    break
+                if None in node:
+                    end = j + 1
+            res.append(end)
+        return res
+
+    @staticmethod
+    def _matches(ends, start=0, limit=None):
+        """
+        Scan a string for non-overlapping longest matches of graphemes, from left to right.
+
+        :param ends: Longest matches as computed by `_longest_matches`.
+        :return: `list` of `(start, end)` pairs.
+        """
+        res, i = [], start
+        while i < len(ends) and (limit is None or len(res) < limit):
+            if ends[i] is None:
+                i += 1
+            else:
+                res.append((i, ends[i]))
+                i = ends[i]
+        return res
 
     def _norm(self, string):
         """Extended normalization: normalize by list of norm-characters, split
         by character "/"."""
-        nstring = norm(string)
         if "/" in string:
-            s, t = string.split('/')
-            nstring = t
+            s, nstring = string.split('/')
+        else:
+            nstring = norm(string)
         return self.normalize(nstring)
 
     def normalize(self, string):
         """Normalize the string according to normalization list"""
-        return ''.join([self._normalize.get(x, x) for x in nfd(string)])
+        return nfd(string).translate(self._normalize_table)
 
     def _from_name(self, string):
         """Parse a sound from its name"""
+        sound = self._names.get(string)
+        if sound is None:
+            sound = self._name_cache.get(string)
+            if sound is None:
+                sound = self._name_cache[string] = self._parse_name(string)._freeze()
+        return sound
+
+    def _parse_name(self, string):
         components = string.split(' ')
         if frozenset(components) in self.features:
             return self.features[frozenset(components)]
@@ -187,12 +344,13 @@ class TranscriptionSystem(TranscriptionBase):
 
         # check whether sound is in self.sounds
         if nstring in self.sounds:
-            sound = self.sounds[nstring]
-            sound.normalized = nstring != string
-            sound.source = string
-            return sound
+            # we return a copy, to not leak the source between callers
+            return attr.evolve(
+                self.sounds[nstring], normalized=nstring != string, source=string)
 
-        match = list(self._regex.finditer(nstring))
+        ends = self._longest_matches(nstring)
+        # we only need to know whether there are one, two or more matches
+        match = self._matches(ends, limit=3)
 
         if len(match) != 1 and len(match) != 2:
             # Either no match or more than one; both is considered an error.
@@ -204,8 +362,8 @@ class TranscriptionSystem(TranscriptionBase):
         # the second element
         checked_for_two = False
         if len(match) == 2:
-            sound1 = self._parse(nstring[:match[1].start()])
-            sound2 = self._parse(nstring[match[1].start():])
+            sound1 = self._parse(nstring[:match[1][0]])
+            sound2 = self._parse(nstring[match[1][0]:])
             # if we have ANY unknown sound, we mark the whole sound as unknown, if
             # we have two known sounds of the same type (vowel or consonant), we
             # either construct a diphthong or a cluster
@@ -238,11 +396,10 @@ class TranscriptionSystem(TranscriptionBase):
 
             i = 1
             while i < len(nstring):
-                new_match = list(self._regex.finditer(nstring[i:]))
+                new_match = self._matches(ends, start=i, limit=2)
                 if len(new_match) == 1:
-                    pre, mid, post = nstring[i:].partition(
-                        nstring[i:][new_match[0].start():new_match[0].end()])
-                    pre = nstring[:i] + pre
+                    start, end = new_match[0]
+                    pre, mid, post = nstring[:start], nstring[start:end], nstring[end:]
                     checked_for_two = True
                     break
                 i += 1
@@ -250,14 +407,15 @@ class TranscriptionSystem(TranscriptionBase):
                 return UnknownSound(grapheme=nstring, source=string, ts=self)  # noqa: F405
 
         if not checked_for_two:
-            pre, mid, post = nstring.partition(nstring[match[0].start():match[0].end()])
+            start, end = match[0]
+            pre, mid, post = nstring[:start], nstring[start:end], nstring[end:]
         base_sound = self.sounds[mid]
         if isinstance(base_sound, Marker):  # noqa: F405
             assert pre or post
             return UnknownSound(grapheme=nstring, source=string, ts=self)  # noqa: F405
 
         # A base sound with diacritics or a custom symbol.
-        features = attr.asdict(base_sound)
+        features = attr.asdict(base_sound, recurse=False, filter=lambda a, v: a.init)
         features.update(
             source=string,
             generated=True,
@@ -307,11 +465,85 @@ class TranscriptionSystem(TranscriptionBase):
             return self.features[string.featureset]
         elif isinstance(string, Symbol):  # noqa: F405
             return string
-        if set(string.split(' ')).intersection(
-                list(self.sound_classes) + ['diphthong', 'cluster']):
-            return self._from_name(string)
-        string = nfd(string)
-        return self._parse(string)
+        sound = self.cache.get(string)
+        if sound is None:
+            if not self._name_types.isdisjoint(string.split(' ')):
+                sound = self._from_name(string)
+            else:
+                sound = self._parse(nfd(string))
+            self.cache[string] = sound._freeze()
+        return sound
+
+    def _vocabulary_items(self):
+        # Sounds are identified by name, since different graphemes may denote the same sound.
+        return sorted(self._names)
+
+    def _vocabulary_item(self, res):
+        if getattr(res, 'type', 'unknownsound') == 'unknownsound':
+            return None
+        return res.name
+
+    def _base_grapheme(self, features):
+        """
+        Find the base for rendering a generated sound.
+
+        :param features: `tuple` of feature values of the sound, in name order, ending with the \
+        sound type.
+        :return: The grapheme of the sound defined for the shortest suffix of `features` or `None`.
+        """
+        try:
+            return self._base_graphemes[features]
+        except KeyError:
+            res = None
+            for i in range(len(features) - 1, -1, -1):
+                base = self.features.get(frozenset(features[i:]))
+                if base:
+                    res = base.grapheme
+                    break
+            self._base_graphemes[features] = res
+            return res
+
+    def _base_features(self, grapheme):
+        """
+        The features specified by a basic sound of the system.
+        """
+        try:
+            return self._base_feature_sets[grapheme]
+        except KeyError:
+            res = self._base_feature_sets[grapheme] = frozenset(
+                self._feature_values[elm] for elm in self.sounds[grapheme].name.split(' ')[:-1])
+            return res
+
+    def bitmask(self, features):
+        """
+        Encode a set of feature values as integer with one bit set per feature value.
+        """
+        res = 0
+        for feature in features:
+            bit = self.feature_bits.get(feature)
+            if bit is None:
+                bit = self.feature_bits[feature] = len(self.feature_bits)
+            res |= 1 << bit
+        return res
+
+    def feature_matrix(self, sounds=None, sparse=False, dtype='uint8'):
+        """
+        One-hot encoding of the features of sounds.
+
+        :param sounds: Iterable of sounds or graphemes; defaults to all sounds defined in the \
+        system, ordered by name - like the codes of the system's `vocabulary`.
+        :return: `FeatureMatrix` instance.
+        """
+        # Imported here, to not load numpy when importing pyclts:
+        from pyclts.featurematrix import FeatureMatrix
+
+        if sounds is None:
+            sounds = [self._names[name] for name in sorted(self._names)]
+        else:
+            if isinstance(sounds, str):
+                sounds = sounds.split()
+            sounds = [s if isinstance(s, Symbol) else self[s] for s in sounds]  # noqa: F405
+        return FeatureMatrix.from_sounds(sounds, self, sparse=sparse, dtype=dtype)
 
     @property
     def feature_system(self):
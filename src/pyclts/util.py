@@ -1,23 +1,47 @@
 """Auxiliary functions for pyclts."""
+import io
+import pickle
+import hashlib
 import pathlib
 import collections
 import unicodedata
+import concurrent.futures
 
+from clldutils import jsonlib
 from clldutils.markup import iter_markdown_sections
 from csvw.dsv import reader
 
-__all__ = ['EMPTY', 'UNKNOWN', 'norm', 'nfd', 'TranscriptionBase', 'jaccard']
+__all__ = ['EMPTY', 'UNKNOWN', 'norm', 'nfd', 'TranscriptionBase', 'jaccard', 'LRUCache',
+           'popcount', 'bitmask_jaccard', 'TranslationTable', 'Vocabulary']
 
 EMPTY = "◌"
 UNKNOWN = "�"
 
 
+def _numpy():
+    """
+    Import numpy lazily, to keep it an optional dependency which is only loaded when needed.
+    """
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover
+        raise ImportError('Encoding sounds as arrays requires numpy.')
+    return numpy
+
+
 class TranscriptionBase(object):
     __type__ = None
 
     def __init__(self, path, system=None):
         self.path = pathlib.Path(path)
         self.system = system
+        self._translation_tables = None
+        self._vocabulary = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_translation_tables'] = None
+        return state
 
     @property
     def id(self):
@@ -39,15 +63,325 @@ class TranscriptionBase(object):
         except KeyError:
             return default
 
-    def __call__(self, sounds, default="0"):
+    def __call__(self, sounds, default="0", as_array=False):
+        """
+        :param as_array: Flag signaling whether to return the codes of the sounds in the \
+        vocabulary of the system as `numpy` array (see `encode`).
+        """
+        if as_array:
+            return self.encode(sounds)
+        return self.resolve_many(sounds, on_unknown=default)
+
+    @property
+    def vocabulary(self):
+        """
+        The `Vocabulary` of integer codes for the sounds (or sound classes, etc.) of the system.
+        """
+        if self._vocabulary is None:
+            self._vocabulary = Vocabulary(self._vocabulary_items())
+        return self._vocabulary
+
+    def _vocabulary_items(self):
+        raise NotImplementedError  # pragma: no cover
+
+    def _vocabulary_item(self, res):
+        """
+        The vocabulary item for an object returned by `get`, `None` for unknown sounds.
+        """
+        return res if isinstance(res, str) else None
+
+    def encode(self, sounds, extend=False, dtype='int32'):
+        """
+        Encode a sequence of sounds as `numpy` array of codes in `TranscriptionBase.vocabulary`.
+
+        :param sounds: Iterable of sounds or a string of space-separated sounds.
+        :param extend: Flag signaling whether to add sounds which are not yet in the vocabulary, \
+        rather than encoding them as `Vocabulary.UNKNOWN`.
+        """
+        np = _numpy()
+        indices, codes = self._encode(sounds, extend)
+        return np.asarray(codes, dtype=dtype)[np.asarray(indices, dtype=np.intp)]
+
+    def encode_many(self, sequences, extend=False, dtype='int32'):
+        """
+        Encode a batch of sequences of sounds.
+
+        :return: Pair (matrix, lengths) of `numpy` arrays, where the rows of `matrix` hold the \
+        codes of the sequences, padded with `Vocabulary.PAD`.
+        """
+        np = _numpy()
+        sequences = [s.split() if isinstance(s, str) else list(s) for s in sequences]
+        lengths = np.array([len(s) for s in sequences], dtype=np.intp)
+        # Sounds are resolved for the complete batch at once, so each distinct sound only once.
+        indices, codes = self._encode([sound for s in sequences for sound in s], extend)
+        matrix = np.full(
+            (len(sequences), lengths.max() if len(sequences) else 0), Vocabulary.PAD, dtype=dtype)
+        matrix[np.arange(matrix.shape[1]) < lengths[:, None]] = \
+            np.asarray(codes, dtype=dtype)[np.asarray(indices, dtype=np.intp)]
+        return matrix, lengths
+
+    def _encode(self, sounds, extend):
+        indices, table = self.resolve_many(sounds, as_index=True)
+        vocabulary = self.vocabulary
+        return indices, [vocabulary.code(self._vocabulary_item(res), add=extend) for res in table]
+
+    def resolve_many(self, sounds, on_unknown=None, as_index=False, workers=None):
+        """
+        Resolve a sequence of sounds, resolving each distinct item only once.
+
+        :param sounds: Iterable of sounds or a string of space-separated sounds.
+        :param on_unknown: Value to return for sounds which cannot be resolved (see `get`).
+        :param as_index: Flag signaling whether to return a pair (indices, table) instead of a \
+        `list` of resolved sounds, where `table` is the `list` of distinct results and `indices` \
+        holds the position in `table` for each input item.
+        :param workers: Number of processes to spread the resolution of distinct strings over.
+        """
         if isinstance(sounds, str):
             sounds = sounds.split()
 
-        return [self.get(x, default=default) for x in sounds]
+        indices, distinct, seen = [], [], {}
+        for sound in sounds:
+            try:
+                index, hashable = seen.get(sound), True
+            except TypeError:  # Unhashable symbols are resolved individually.
+                index, hashable = None, False
+            if index is None:
+                index = len(distinct)
+                distinct.append(sound)
+                if hashable:
+                    seen[sound] = index
+            indices.append(index)
+
+        if workers and workers > 1:
+            table = self._resolve_parallel(distinct, on_unknown, workers)
+        else:
+            table = [self.get(sound, default=on_unknown) for sound in distinct]
+
+        if as_index:
+            return indices, table
+        return [table[i] for i in indices]
+
+    def _systems(self):
+        """
+        The transcription systems objects returned by `resolve_sound` may refer to.
+        """
+        return [self] + ([self.system] if isinstance(self.system, TranscriptionBase) else [])
+
+    def _resolve_parallel(self, sounds, on_unknown, workers):
+        table = [None] * len(sounds)
+        # Only strings are sent to the workers, sound objects are resolved locally.
+        positions = [i for i, sound in enumerate(sounds) if isinstance(sound, str)]
+        for i, sound in enumerate(sounds):
+            if not isinstance(sound, str):
+                table[i] = self.get(sound, default=on_unknown)
+
+        chunksize = max(1, -(-len(positions) // (workers * 4)))
+        chunks = [positions[i:i + chunksize] for i in range(0, len(positions), chunksize)]
+        # The system is passed to each worker once - or inherited, when processes are forked.
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            for chunk, res in zip(chunks, executor.map(
+                    _resolve_chunk,
+                    [[sounds[i] for i in chunk] for chunk in chunks],
+                    [on_unknown] * len(chunks))):
+                for i, sound in zip(chunk, _SystemUnpickler(io.BytesIO(res), self).load()):
+                    table[i] = sound
+        return table
 
     def translate(self, string, target_system):
-        return ' '.join('{0}'.format(
-            target_system.get(self[s].name or '?', '?')) for s in string.split())
+        table = self.translation_table(target_system)
+        return ' '.join(table[s] for s in string.split())
+
+    def translation_table(self, target_system, fname=None):
+        """
+        The `TranslationTable` used to translate sounds into `target_system`.
+
+        :param fname: Path of a file written with `TranslationTable.save` to read translations \
+        from, if it exists and no table for `target_system` is cached yet.
+        """
+        if self._translation_tables is None:
+            # Tables refer to their target system, so weak references to it would not help.
+            self._translation_tables = {}
+        if target_system not in self._translation_tables:
+            if fname and pathlib.Path(fname).exists():
+                self._translation_tables[target_system] = TranslationTable.load(
+                    fname, self, target_system)
+            else:
+                self._translation_tables[target_system] = TranslationTable(self, target_system)
+        return self._translation_tables[target_system]
+
+
+class TranslationTable(object):
+    """
+    Mapping of graphemes in a source system to their translation in a target system.
+
+    Graphemes are translated via the name of the sound they denote in the source system. The
+    translations are cached, so they are computed only once per grapheme.
+    """
+    def __init__(self, source, target, mapping=None):
+        self.source = source
+        self.target = target
+        self.mapping = mapping or {}
+
+    def __len__(self):
+        return len(self.mapping)
+
+    def __getitem__(self, grapheme):
+        try:
+            return self.mapping[grapheme]
+        except KeyError:
+            res = self.mapping[grapheme] = '{0}'.format(
+                self.target.get(self.source[grapheme].name or '?', '?'))
+            return res
+
+    def compile(self):
+        """
+        Add translations for all graphemes known to the source system.
+        """
+        for grapheme in self.source.sounds:
+            try:
+                self[grapheme]
+            except (KeyError, ValueError):
+                # The sound can not be translated into the target system.
+                pass
+        return self
+
+    def save(self, fname):
+        jsonlib.dump(
+            dict(source=self.source.id, target=self.target.id, mapping=self.mapping),
+            fname,
+            ensure_ascii=False)
+
+    @classmethod
+    def load(cls, fname, source, target):
+        """
+        Load translations saved with `TranslationTable.save`.
+        """
+        data = jsonlib.load(fname)
+        if (data['source'], data['target']) != (source.id, target.id):
+            raise ValueError('Translation table for {0} -> {1}'.format(
+                data['source'], data['target']))
+        return cls(source, target, mapping=data['mapping'])
+
+
+class Vocabulary(object):
+    """
+    A mapping of items to integer codes.
+
+    Codes for the items a vocabulary is created with depend only on these items, items added
+    later get codes in the order in which they are added.
+    """
+    PAD = 0
+    UNKNOWN = 1
+
+    def __init__(self, items):
+        self.items = ['', UNKNOWN]
+        self.codes = {}
+        for item in items:
+            self.code(item, add=True)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, code):
+        return self.items[code]
+
+    def __contains__(self, item):
+        return item in self.codes
+
+    def code(self, item, add=False):
+        res = self.codes.get(item)
+        if res is None:
+            if item is None or not add:
+                return self.UNKNOWN
+            res = self.codes[item] = len(self.items)
+            self.items.append(item)
+        return res
+
+
+class LRUCache(object):
+    """
+    A mapping of bounded size, evicting the least recently used items first.
+
+    Cache statistics are available as attributes `hits`, `misses` and `evictions`.
+    """
+    def __init__(self, maxsize=None):
+        """
+        :param maxsize: Maximal number of items to keep, `None` means unbounded, `0` disables \
+        the cache.
+        """
+        self.maxsize = maxsize
+        self._data = collections.OrderedDict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        try:
+            res = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return res
+
+    def __setitem__(self, key, value):
+        if self.maxsize == 0:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if self.maxsize is not None and len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def __repr__(self):
+        return '<LRUCache maxsize={0} size={1} hits={2} misses={3} evictions={4}>'.format(
+            self.maxsize, len(self), self.hits, self.misses, self.evictions)
+
+
+class _SystemPickler(pickle.Pickler):
+    """
+    Pickles resolved sounds with references to - rather than copies of - transcription systems.
+    """
+    def __init__(self, file, system):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._ids = {id(s): i for i, s in enumerate(system._systems())}
+
+    def persistent_id(self, obj):
+        return self._ids.get(id(obj))
+
+
+class _SystemUnpickler(pickle.Unpickler):
+    def __init__(self, file, system):
+        super().__init__(file)
+        self._systems = system._systems()
+
+    def persistent_load(self, pid):
+        return self._systems[pid]
+
+
+_worker_system = None
+
+
+def _init_worker(system):
+    global _worker_system
+    _worker_system = system
+
+
+def _resolve_chunk(sounds, on_unknown):
+    res = io.BytesIO()
+    _SystemPickler(res, _worker_system).dump(
+        [_worker_system.get(sound, default=on_unknown) for sound in sounds])
+    return res.getvalue()
 
 
 def norm(string):
@@ -55,6 +389,8 @@ def norm(string):
 
 
 def nfd(string):
+    if unicodedata.is_normalized("NFD", string):
+        return string
     return unicodedata.normalize("NFD", string)
 
 
@@ -69,10 +405,14 @@ def itertable(table):
         yield res
 
 
-def read_data(fname, grapheme_col, *cols):
+def read_data(fname, grapheme_col, *cols, rows=None):
+    """
+    :param rows: Rows of `fname` which have already been read, e.g. to read a table with \
+    data for multiple sound class systems only once.
+    """
     grapheme_map, data, sounds, names = {}, collections.defaultdict(list), [], []
 
-    for row in reader(fname, delimiter='\t', dicts=True):
+    for row in (reader(fname, delimiter='\t', dicts=True) if rows is None else rows):
         grapheme_map[nfd(row[grapheme_col])] = row['BIPA_GRAPHEME']
         grapheme = {"grapheme": row[grapheme_col]}
         for col in cols:
@@ -85,11 +425,44 @@ def read_data(fname, grapheme_col, *cols):
     return grapheme_map, data, sounds, names
 
 
+def content_hash(*paths):
+    """
+    Compute a checksum over the content of files and (recursively) directories.
+
+    File names relative to the given paths are part of the hashed data, so renaming a table
+    changes the checksum as well.
+    """
+    md5 = hashlib.md5()
+    for path in paths:
+        path = pathlib.Path(path)
+        files = sorted(p for p in path.rglob('*') if p.is_file()) if path.is_dir() else [path]
+        for p in files:
+            md5.update(p.relative_to(path).as_posix().encode('utf8'))
+            md5.update(b'\0')
+            md5.update(p.read_bytes())
+            md5.update(b'\0')
+    return md5.hexdigest()
+
+
 def jaccard(a, b):
     i, u = len(a.intersection(b)), len(a.union(b))
     return i / u if u else 0
 
 
+try:
+    popcount = int.bit_count
+except AttributeError:  # pragma: no cover
+    def popcount(n):
+        """Number of bits set in an integer (Python < 3.10)."""
+        return bin(n).count('1')
+
+
+def bitmask_jaccard(a, b):
+    """Jaccard index of two sets encoded as integer bitmasks."""
+    u = popcount(a | b)
+    return popcount(a & b) / u if u else 0
+
+
 def upsert_section(p, in_header, level, new):  # pragma: no cover
     res, found, in_section = [], False, False
     for clevel, header, text in iter_markdown_sections(p.read_text(encoding='utf8')):
@@ -1,6 +1,10 @@
+import shutil
+
 import pytest
 
 from pyclts.api import CLTS
+from pyclts.transcriptionsystem import TranscriptionSystem
+from pyclts.soundclasses import SOUNDCLASS_SYSTEMS
 
 
 @pytest.fixture
@@ -53,3 +57,52 @@ def test_transcriptiondata(api, repos):
 
     assert api.get_meta(td)
     assert api.transcriptiondata(repos / 'pkg' / 'transcriptiondata' / 'phoible.tsv')
+
+
+def test_transcriptionsystem_snapshot(tmp_repos, tmp_path, mocker):
+    cache_dir = tmp_path / 'cache'
+    bipa = CLTS(tmp_repos, cache_dir=cache_dir).bipa
+    assert len(list(cache_dir.glob('bipa-*.snapshot'))) == 1
+
+    init = mocker.spy(TranscriptionSystem, '__init__')
+    snapshot = CLTS(tmp_repos, cache_dir=cache_dir).bipa
+    assert init.call_count == 0
+    assert snapshot.id == 'bipa'
+    assert snapshot['dʱʷ'].name == bipa['dʱʷ'].name
+    assert snapshot.system.tabledict
+
+    # Changing the data invalidates the snapshot:
+    readme = tmp_repos / 'pkg' / 'transcriptionsystems' / 'bipa' / 'README.md'
+    readme.write_text(readme.read_text(encoding='utf8') + '\n', encoding='utf8')
+    assert CLTS(tmp_repos, cache_dir=cache_dir).bipa
+    assert init.call_count == 1
+
+    # Systems with the same name at another location get their own snapshot:
+    other = tmp_path / 'other' / 'bipa'
+    shutil.copytree(str(tmp_repos / 'pkg' / 'transcriptionsystems' / 'bipa'), str(other))
+    assert CLTS(tmp_repos, cache_dir=cache_dir).transcriptionsystem(other).id == 'bipa'
+    assert len(list(cache_dir.glob('bipa-*.snapshot'))) == 2
+
+    # Failing to write a snapshot does not prevent loading the system:
+    mocker.patch.object(TranscriptionSystem, 'to_snapshot', side_effect=OSError)
+    readme.write_text(readme.read_text(encoding='utf8') + '\n', encoding='utf8')
+    assert CLTS(tmp_repos, cache_dir=cache_dir).bipa['t'].name
+
+
+def test_soundclass_convert(api):
+    sc = api.soundclass('dolgo')
+    assert sc.convert('tʰ a ai xy', default=None) == ['T', 'V', 'V', None]
+    assert sc.convert([api.bipa['tʰ'], 'ts']) == ['T', 'K']
+    assert sc.convert(['xy']) == ['0']
+    assert sc._by_grapheme['t'] == 'T'
+    assert sc._cache.get('xy') is None and 'xy' in sc._cache
+
+
+def test_soundclass_converter(api):
+    converter = api.soundclass_converter()
+    res = converter.convert('tʰ a xy')
+    assert set(res) == set(SOUNDCLASS_SYSTEMS)
+    for key, classes in res.items():
+        assert classes == api.soundclass(key).convert('tʰ a xy')
+    assert api.soundclass_converter('dolgo', 'cv').convert(['t', 'a']) == \
+        {'dolgo': ['T', 'V'], 'cv': ['C', 'V']}
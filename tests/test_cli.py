@@ -42,6 +42,14 @@ def test_map(tmp_repos, capsys, fixtures):
     out, _ = capsys.readouterr()
     assert 'BIPA' in out
 
+    # Unknown graphemes are split into two sounds, to detect pre-nasalized consonants:
+    tmp_repos.joinpath('sources', 'allenbai', 'graphemes.tsv').write_text(
+        'BIPA\tGRAPHEME\tCOUNT\tSYMBOLS\n\tms\t1\t\n\tmb*\t1\t\n', encoding='utf8')
+    main(['--repos', str(tmp_repos), 'map', 'allenbai'])
+    out, _ = capsys.readouterr()
+    assert '(*)ⁿs\tms' in out
+    assert '(?)\tmb*' in out
+
 
 def test_make_dataset(tmp_repos, capsys, fixtures):
     main(['--repos', str(tmp_repos), 'make_dataset', 'allenbai'])
@@ -1,6 +1,8 @@
 import pytest
 
 from pyclts.models import Marker, UnknownSound, is_valid_sound, Symbol, Sound
+from pyclts.util import TranslationTable
+from pyclts.util import Vocabulary
 
 
 def test_TranscriptionBase_translate(bipa, asjp):
@@ -176,3 +178,74 @@ def test_models(bipa, asjp):
         ts=asjp, grapheme='1', source='1')
 
     assert pytest.approx(1.0) == bipa['t'].similarity(asjp['t'])
+
+
+def test_resolve_many(bipa, api):
+    string = 't e _ s t + e n t'
+    assert bipa.resolve_many(string) == bipa(string, default=None)
+    indices, table = bipa.resolve_many(string.split(), as_index=True)
+    assert indices == [0, 1, 2, 3, 0, 4, 1, 5, 0]
+    assert [str(s) for s in table] == ['t', 'e', '_', 's', '+', 'n']
+
+    # unhashable symbols are resolved one by one:
+    assert len(bipa.resolve_many([bipa['_'], bipa['_']], as_index=True)[1]) == 2
+
+    sca = api.soundclass('sca')
+    assert sca.resolve_many('t xy t', on_unknown='?') == ['T', '?', 'T']
+
+
+def test_resolve_many_parallel(bipa, api):
+    string = 'th a ts ai tk kʷʰ a * _ {0}'.format(bipa['t'].name)
+    res = bipa.resolve_many(string, workers=2)
+    assert [str(s) for s in res] == [str(s) for s in bipa.resolve_many(string)]
+    assert all(s.ts is bipa for s in res)
+    assert res[4].from_sound.ts is bipa
+    assert bipa.resolve_many([bipa['t'], 't'], workers=2)[0] == bipa['t']
+
+    sca = api.soundclass('sca')
+    assert sca.resolve_many('t xy t', on_unknown='?', workers=2) == ['T', '?', 'T']
+
+
+def test_encode(bipa, api):
+    codes = bipa.encode('t a xy t')
+    assert codes.tolist() == [
+        bipa.vocabulary.code(bipa['t'].name), bipa.vocabulary.code(bipa['a'].name),
+        Vocabulary.UNKNOWN, bipa.vocabulary.code(bipa['t'].name)]
+    assert bipa('t a', as_array=True).tolist() == codes[:2].tolist()
+    assert bipa.vocabulary[codes[0]] == bipa['t'].name
+
+    # Generated sounds are only encoded when the vocabulary is extended:
+    assert bipa.encode('ai')[0] == Vocabulary.UNKNOWN
+    assert bipa.vocabulary[bipa.encode('ai', extend=True)[0]] == bipa['ai'].name
+
+    matrix, lengths = bipa.encode_many(['t a', '', 'a xy t'])
+    assert matrix.shape == (3, 3) and lengths.tolist() == [2, 0, 3]
+    assert matrix[0].tolist() == codes[:2].tolist() + [Vocabulary.PAD]
+    assert matrix[2].tolist() == bipa.encode('a xy t').tolist()
+
+    sca = api.soundclass('sca')
+    assert [sca.vocabulary[c] for c in sca.encode('t a')] == ['T', 'A']
+
+
+def test_translation_table(bipa, asjp, api, tmp_path):
+    table = bipa.translation_table(asjp)
+    assert bipa.translation_table(asjp) is table
+    assert bipa.translate('ts a', asjp) == 'c E'
+    assert table.mapping['ts'] == 'c'
+    assert table.compile().mapping['p'] == 'p'
+    # Sounds with features unknown to the target system can not be translated:
+    with pytest.raises(ValueError):
+        bipa.translate('n̼', asjp)
+
+    table.save(tmp_path / 'bipa-asjp.json')
+    # Cached tables are not replaced by the content of the file:
+    assert bipa.translation_table(asjp, fname=tmp_path / 'bipa-asjp.json') is table
+    del bipa._translation_tables[asjp]
+    loaded = bipa.translation_table(asjp, fname=tmp_path / 'bipa-asjp.json')
+    assert loaded is not table and loaded.mapping == table.mapping
+    loaded['tʰ']
+    assert bipa.translation_table(asjp, fname=tmp_path / 'bipa-asjp.json').mapping['tʰ']
+    with pytest.raises(ValueError):
+        TranslationTable.load(tmp_path / 'bipa-asjp.json', asjp, bipa)
+
+    assert bipa.translate('f a t ə r', api.soundclass('sca')) == 'B A T E R'
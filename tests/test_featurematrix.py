@@ -0,0 +1,69 @@
+import sys
+import subprocess
+
+import pytest
+import numpy as np
+
+from pyclts.featurematrix import FeatureMatrix
+
+
+def test_lazy_import():
+    # Importing pyclts must not load numpy - it is only loaded for feature matrices.
+    subprocess.check_call([
+        sys.executable,
+        '-c',
+        'import sys, pyclts; assert not any(m.startswith("numpy") for m in sys.modules)'])
+
+
+def test_feature_matrix(bipa, tmp_path):
+    matrix = bipa.feature_matrix()
+    assert matrix.data.shape == (len(bipa._names), len(bipa.feature_bits)) and not matrix.sparse
+    t = bipa['t']
+    row = matrix.data[matrix.rows.index(t.name)]
+    assert {matrix.columns[i] for i in np.flatnonzero(row)} == t.featureset
+    # The columns correspond to the bits of the sounds' bitmasks:
+    assert sum(1 << int(i) for i in np.flatnonzero(row)) == t.bitmask
+
+    matrix.save(tmp_path / 'bipa.npy')
+    loaded = FeatureMatrix.load(tmp_path / 'bipa.npy')
+    assert isinstance(loaded.data, np.memmap)
+    assert loaded.rows == matrix.rows and loaded.columns == matrix.columns
+    assert (loaded.data == matrix.data).all()
+
+
+def test_feature_matrix_sparse(bipa, tmp_path):
+    matrix = bipa.feature_matrix('t ai xy', sparse=True)
+    assert matrix.sparse and matrix.rows[-1] == 'xy'
+    assert matrix.todense().sum(axis=1).tolist() == [
+        len(bipa['t'].featureset), len(bipa['ai'].featureset), 0]
+
+    matrix.save(tmp_path / 'sounds.npz')
+    loaded = FeatureMatrix.load(tmp_path / 'sounds.npz')
+    assert loaded.rows == matrix.rows and loaded.columns == matrix.columns
+    assert (loaded.todense() == matrix.todense()).all()
+
+
+def test_similarity(bipa):
+    sounds = [bipa[g] for g in 't d a e ai kʷʰ'.split()]
+    matrix = bipa.feature_matrix(sounds)
+    res = matrix.similarity(tile_size=4)
+    assert res.shape == (6, 6)
+    for i, a in enumerate(sounds):
+        for j, b in enumerate(sounds):
+            assert res[i, j] == pytest.approx(a.similarity(b))
+    assert matrix.similarity(distance=True)[0, 1] == pytest.approx(1 - res[0, 1])
+
+    # Matrices with a different number of columns can be compared:
+    other = bipa.feature_matrix('t xy', sparse=True)
+    assert np.allclose(other.similarity(matrix)[0], res[0])
+    assert other.similarity(matrix)[1].sum() == 0
+
+    # Weighted similarity:
+    weights = {'voiced': 0, 'voiceless': 0}
+    assert matrix.similarity(weights=weights)[0, 1] == 1
+    assert matrix.similarity(weights=[1] * len(matrix.columns))[0, 1] == res[0, 1]
+    with pytest.raises(ValueError):
+        matrix.similarity(weights=[1])
+    tiles = list(matrix.iter_similarity(tile_size=4))
+    assert [(i, j, tile.shape) for i, j, tile in tiles] == [
+        (0, 0, (4, 4)), (0, 4, (4, 2)), (4, 0, (2, 4)), (4, 4, (2, 2))]
@@ -1,5 +1,17 @@
+import gc
+import sys
+import pickle
+import weakref
+import statistics
+import subprocess
+import itertools
+
 import pytest
-from pyclts.inventories import reduce_features, Inventory, Phoneme
+from pyclts.inventories import (
+    reduce_features, Inventory, Phoneme, InventoryCollection, Reducer, _approximate,
+    CompactInventoryCollection,
+)
+from pyclts import CLTS
 from pyclts.transcriptionsystem import TranscriptionSystem
 
 
@@ -12,12 +24,41 @@ def bipa(repos):
     )
 
 
+def test_lazy_import():
+    # numpy and scipy are only loaded for similarity matrices and compact collections.
+    subprocess.check_call([
+        sys.executable,
+        '-c',
+        'import sys, pyclts.inventories; '
+        'assert not any(m.split(".")[0] in ("numpy", "scipy") for m in sys.modules)'])
+
+
 def test_reduce_features(bipa):
     assert reduce_features("th", ts=bipa).s == "t"
     assert reduce_features("oe", ts=bipa).s == "o"
     assert reduce_features("⁵⁵", ts=bipa).s == "⁵"
 
 
+def test_Reducer(bipa, repos):
+    reducer = Reducer.get(bipa)
+    assert Reducer.get(bipa) is reducer
+    assert Reducer.get(bipa, features={"vowel": ["height"]}) is not reducer
+    assert reducer("th") is reducer(bipa["th"]) and str(reducer("th")) == "t"
+    assert [str(s) for s in reducer.reduce_many(["aː", "+"], default="?")] == ["a", "?"]
+
+    inv = reducer.reduce_inventory(Inventory.from_list("t", "tʰ", "a", "+", id="x", ts=bipa))
+    assert list(inv.sounds) == ["t", "a", "+"] and inv.id == "x"
+    assert inv.sounds["t"].graphemes_in_source == ["t", "tʰ"]
+
+    # Reducers are stored on the transcription system, so they do not keep it alive:
+    ts = CLTS(repos).bipa
+    assert str(reduce_features("tʰ", ts=ts)) == "t"
+    ref = weakref.ref(ts)
+    del ts
+    gc.collect()
+    assert ref() is None
+
+
 def test_Phoneme(bipa):
     soundA = bipa['K']
     soundB = bipa['U']
@@ -81,3 +122,166 @@ def test_Inventory(bipa):
     inv5 = Inventory.from_list('oː', 'a', ts=bipa)
     assert len(inv4.consonants_by_quality) == 2
     assert len(inv5.vowels_by_quality) == 2
+
+
+def test_approximate_similarity(bipa):
+    inv1 = Inventory.from_list("a", "e", "i", "o", "p", "tʰ", "+", "ai", ts=bipa)
+    inv2 = Inventory.from_list("a", "ɛ", "œ", "b", "t", "d", "+", ts=bipa)
+    # The greedy matching yields the same results as the matching of sounds one by one:
+    soundsA, soundsB = list(inv1.sounds.values()), list(inv2.sounds.values())
+    assert inv1.approximate_similarity(inv2) == statistics.mean(
+        [_approximate(soundsA, soundsB), _approximate(soundsB, soundsA)])
+
+    # Greedy matching matches "tʰ" with "t", leaving "d" for "t", while optimal matching
+    # matches "tʰ" with "d":
+    inv1 = Inventory.from_list("tʰ", "t", ts=bipa)
+    inv2 = Inventory.from_list("t", "d", ts=bipa)
+    assert inv1.approximate_similarity(inv2) == pytest.approx(0.725)
+    assert inv1.approximate_similarity(inv2, method="optimal") == pytest.approx(0.75)
+    with pytest.raises(ValueError):
+        inv1.approximate_similarity(inv2, method="other")
+
+
+def test_InventoryCollection(bipa):
+    collection = InventoryCollection([
+        Inventory.from_list("a", "e", "i", "o", "p", ts=bipa),
+        Inventory.from_list("a", "e", "i", "œ", "p", "+", ts=bipa),
+        Inventory.from_list("tʰ", "t", "ai", "K", ts=bipa),
+        Inventory.from_list(ts=bipa),
+        Inventory.from_list("t", "d", "+", "K", ts=bipa),
+    ])
+    assert len(collection) == 5 and collection[0] is list(collection)[0]
+    pairs = list(itertools.combinations(collection, 2))
+
+    for aspects in [None, ["consonants", "vowels", "markers"]]:
+        res = collection.similarity_matrix(aspects=aspects)
+        assert res.tolist() == pytest.approx(
+            [a.strict_similarity(b, aspects=aspects) for a, b in pairs])
+        for matching in ["greedy", "optimal"]:
+            res = collection.similarity_matrix(
+                aspects=aspects, method="approximate", matching=matching)
+            assert res.tolist() == [
+                a.approximate_similarity(b, aspects=aspects, method=matching) for a, b in pairs]
+
+    res = collection.similarity_matrix(method="approximate", distance=True, workers=2)
+    assert res.tolist() == [1 - a.approximate_similarity(b) for a, b in pairs]
+    with pytest.raises(ValueError):
+        collection.similarity_matrix(method="other")
+    for method in ["strict", "approximate"]:
+        assert InventoryCollection([]).similarity_matrix(method=method).tolist() == []
+        assert InventoryCollection([collection[0]]).similarity_matrix(method=method).tolist() == []
+
+
+def test_Inventory_views(bipa):
+    inv = Inventory.from_list("a", "e", "tː", "t", "k", ts=bipa)
+    consonants = inv.consonants
+    assert inv.consonants == consonants and "consonants" in inv._views
+    # Views are read-only, so the cached views can not be modified:
+    with pytest.raises(TypeError):
+        del inv.consonants["t"]
+    assert inv.strict_similarity(Inventory.from_list("a", "e", "tː", "t", "k", ts=bipa)) == 1
+    assert list(pickle.loads(pickle.dumps(inv)).consonants) == ["tː", "t", "k"]
+    assert list(inv.consonants_by_quality) == ["t", "k"]
+
+    # Views are updated when the sounds of the inventory change:
+    inv.sounds["p"] = Phoneme(grapheme="p", sound=bipa["p"])
+    assert list(inv.consonants) == ["tː", "t", "k", "p"]
+    del inv.sounds["tː"]
+    assert list(inv.consonants_by_quality) == ["t", "k", "p"]
+    inv.sounds = {"i": Phoneme(grapheme="i", sound=bipa["i"])}
+    assert list(inv.vowels) == ["i"] and not inv.consonants
+    assert inv == Inventory(sounds=inv.sounds, ts=bipa)
+
+
+def test_InventoryCollection_from_rows(bipa, tmp_path):
+    from pycldf import StructureDataset
+
+    rows = [
+        dict(ID="1", Language_ID="l1", Value="a"),
+        dict(ID="2", Language_ID="l1", Value="th"),
+        dict(ID="3", Language_ID="l2", Value="tʰ"),
+        dict(ID="4", Language_ID="l1", Value="tʰ"),
+        dict(ID="5", Language_ID="l2", Value=""),
+    ]
+    collection = InventoryCollection.from_rows(rows, ts=bipa, workers=2)
+    assert [inv.id for inv in collection] == ["l1", "l2"]
+    assert collection[0].language == "l1"
+    assert list(collection[0].sounds) == ["a", "tʰ"]
+    assert collection[0].sounds["tʰ"].graphemes_in_source == \
+        Inventory.from_list("th", "tʰ", ts=bipa).sounds["tʰ"].graphemes_in_source
+    assert collection[0].sounds["tʰ"].occs == ["2", "4"]
+    assert len(collection[1].consonants) == 1
+
+    ds = StructureDataset.in_dir(tmp_path)
+    ds.add_component("LanguageTable")
+    ds.write(
+        LanguageTable=[dict(ID="l1"), dict(ID="l2")],
+        ValueTable=[dict(r, Parameter_ID="p") for r in rows])
+    collection = InventoryCollection.from_cldf(tmp_path / "StructureDataset-metadata.json", ts=bipa)
+    assert len(collection) == 2 and collection[0].sounds["tʰ"].occs == ["2", "4"]
+
+
+def test_CompactInventoryCollection(bipa, asjp, tmp_path):
+    collection = InventoryCollection.from_rows([
+        dict(ID="1", Language_ID="l1", Value="a"),
+        dict(ID="2", Language_ID="l1", Value="th"),
+        dict(ID="3", Language_ID="l2", Value="tʰ"),
+        dict(ID="4", Language_ID="l1", Value="tʰ"),
+        dict(ID="5", Language_ID="l3", Value="+"),
+    ], ts=bipa)
+    collection.inventories.append(Inventory(id="empty", sounds={}, ts=bipa))
+    compact = CompactInventoryCollection.from_inventories(collection)
+    compact.save(tmp_path / "inventories.bin")
+
+    for mmap in [True, False]:
+        loaded = CompactInventoryCollection.load(tmp_path / "inventories.bin", ts=bipa, mmap=mmap)
+        assert len(loaded) == 4
+        assert loaded.sound_indices(1).tolist() == [1]
+        if mmap:  # Memory-mapped arrays are aligned:
+            assert all(a.ctypes.data % 64 == 0 for a in loaded.arrays.values() if len(a))
+        for inventory, expected in zip(loaded, collection):
+            assert (inventory.id, inventory.language) == (expected.id, expected.language)
+            assert list(inventory.sounds) == list(expected.sounds)
+            for k, phoneme in inventory.sounds.items():
+                assert phoneme.name == expected.sounds[k].name
+                assert phoneme.graphemes_in_source == expected.sounds[k].graphemes_in_source
+                assert phoneme.occs == expected.sounds[k].occs
+        assert loaded.to_collection().similarity_matrix().tolist() == \
+            collection.similarity_matrix().tolist()
+
+    assert compact[-1].id == "empty" and compact[-2].id == "l3"
+    assert list(compact[-2].sounds) == list(compact[2].sounds) == ["+"]
+    assert compact.sound_indices(-2).tolist() == compact.sound_indices(2).tolist()
+    with pytest.raises(IndexError):
+        compact[4]
+    with pytest.raises(IndexError):
+        compact[-5]
+    # Collections must be loaded with the system they were saved with:
+    with pytest.raises(ValueError):
+        CompactInventoryCollection.load(tmp_path / "inventories.bin", ts=asjp)
+    CompactInventoryCollection(compact.arrays, compact.tables, ts=asjp).save(tmp_path / "asjp.bin")
+    with pytest.raises(ValueError):
+        CompactInventoryCollection.load(tmp_path / "asjp.bin")
+
+    (tmp_path / "other.bin").write_bytes(b"other")
+    with pytest.raises(ValueError):
+        CompactInventoryCollection.load(tmp_path / "other.bin")
+
+
+def test_fingerprint(bipa):
+    inv1 = Inventory.from_list("a", "e", "tʰ", "aː", ts=bipa)
+    inv2 = Inventory.from_list("th", "e", "a", "aː", ts=bipa)
+    inv3 = Inventory.from_list("a", "e", "t", "a:", ts=bipa)
+    assert inv1.fingerprint() == inv2.fingerprint() != inv3.fingerprint()
+    assert inv1.fingerprint("vowels") == inv3.fingerprint("vowels")
+    assert inv1.fingerprint("vowels_by_quality") != inv1.fingerprint("vowels")
+
+    fingerprint = inv3.fingerprint()
+    inv3.sounds["p"] = Phoneme(grapheme="p", sound=bipa["p"])
+    assert inv3.fingerprint() != fingerprint
+
+    collection = InventoryCollection([inv1, inv3, inv2])
+    assert list(collection.group_by_fingerprint().values()) == [[0, 2], [1]]
+    assert list(collection.group_by_fingerprint("vowels").values()) == [[0, 1, 2]]
+    assert [inv.fingerprint() for inv in collection.deduplicate()] == \
+        [inv1.fingerprint(), inv3.fingerprint()]
@@ -0,0 +1,47 @@
+import pytest
+
+from pyclts.inventories import Inventory
+from pyclts.inventoryindex import InventoryIndex
+
+
+@pytest.fixture
+def inventories(bipa):
+    return [
+        Inventory.from_list(*sounds.split(), id=str(i), ts=bipa) for i, sounds in enumerate([
+            'a e i o u p t k b d g m n s',
+            'a e i o u p t k b d g m n',
+            'a i u p t k m n s h',
+            'ɑ ɛ ɔ pʰ tʰ kʰ',
+            'a e i o u p t k b d g m n s ŋ',
+        ])]
+
+
+def test_InventoryIndex(inventories, tmp_path):
+    index = InventoryIndex()
+    for inventory in inventories[:4]:
+        index.insert(inventory)
+    assert len(index) == 4 and index.signatures.shape == (4, 128)
+
+    res = index.query(inventories[4], k=2)
+    assert [key for key, _ in res] == ['0', '1']
+    assert res[0][1] == pytest.approx(14 / 15)
+
+    # Incremental insertion:
+    index.insert(inventories[4], key='new')
+    assert index.query(inventories[0], k=2)[1][0] == 'new'
+
+    index.save(tmp_path / 'index.npz')
+    loaded = InventoryIndex.load(tmp_path / 'index.npz')
+    assert loaded.query(inventories[0]) == index.query(inventories[0])
+
+
+def test_InventoryIndex_reduced(inventories, bipa):
+    index = InventoryIndex(tokens='reduced', aspect='consonants')
+    index.insert(Inventory.from_list('pʰ', 'tʰ', 'kʰ', '+', ts=bipa), key='aspirated')
+    assert index.query(Inventory.from_list('p', 't', 'k', ts=bipa)) == [('aspirated', 1)]
+    assert index.query(Inventory.from_list('a', ts=bipa)) == []
+
+    with pytest.raises(ValueError):
+        InventoryIndex(tokens='features')
+    with pytest.raises(ValueError):
+        InventoryIndex(num_perm=100, bands=32)
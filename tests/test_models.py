@@ -1,6 +1,51 @@
+import attr
+import pytest
+
+from pyclts.util import jaccard
 from pyclts.models import *
 
 
 def test_Sound():
     snd = Sound(None, None)
     d = {snd: 5}
+
+
+def test_slots(bipa):
+    for s in ['t', 'a', '_', 'ai', '⁵⁵', 'A']:
+        assert not hasattr(bipa[s], '__dict__')
+
+
+def test_similarity(bipa):
+    for a, b in [('t', 'd'), ('a', 'e'), ('ai', 'au'), ('tk', 't'), ('⁵⁵', '¹¹')]:
+        assert bipa[a].similarity(bipa[b]) == pytest.approx(
+            jaccard(bipa[a].featureset, bipa[b].featureset))
+    assert bipa['t'].bitmask & bipa['d'].bitmask
+
+
+def test_frozen(bipa):
+    sound = bipa['tʰʷ']
+    assert sound.name is sound.name
+    assert sound.featureset is sound.featureset
+    assert str(sound) is str(sound)
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        sound.alias = True
+    with pytest.raises(attr.exceptions.FrozenInstanceError):
+        bipa['ai'].from_sound.grapheme = 'e'
+
+    # Derived values are only cached for frozen sounds:
+    sound = Consonant(ts=bipa, grapheme='t', manner='stop', place='alveolar')
+    assert sound.name == 'alveolar stop consonant'
+    sound.phonation = 'voiceless'
+    assert sound.name == 'voiceless alveolar stop consonant'
+    featuredict = sound._freeze().featuredict
+    featuredict['manner'] = 'fricative'
+    assert sound.featuredict['manner'] == 'stop'
+
+
+def test_render_generated(bipa):
+    sound = bipa['dʱʷ']
+    assert str(sound) == 'dʷʱ'
+    assert bipa._rendered.get((sound.name, sound.base)) == 'dʷʱ'
+    assert str(bipa[sound.name]) == 'dʷʱ'
+    assert bipa._base_grapheme(
+        ('labialized', 'breathy', 'voiced', 'alveolar', 'stop', 'consonant')) == 'd'
@@ -15,3 +15,40 @@ def test_unknown_sound(bipa):
 def test_feature_system(asjp):
     assert 'affricate' in asjp.feature_system
     assert 'y' in asjp
+
+
+def test_cache(bipa):
+    sound = bipa['tʰʷ']
+    hits = bipa.cache.hits
+    assert bipa['tʰʷ'] is sound
+    assert bipa.cache.hits == hits + 1
+    assert bipa['voiceless alveolar stop consonant'] is \
+        bipa['voiceless alveolar stop consonant']
+
+
+def test_parse_does_not_mutate_sounds(bipa):
+    sound = bipa['ɡ']
+    assert sound.normalized and sound.source == 'ɡ'
+    assert bipa.sounds['g'].source is None
+    assert not bipa.sounds['g'].normalized
+
+
+def test_matches(bipa):
+    ends = bipa._longest_matches('tsʰa*')
+    assert bipa._matches(ends) == [(0, 3), (3, 4)]
+    assert bipa._matches(ends, start=1, limit=1) == [(1, 2)]
+    assert bipa._matches(bipa._longest_matches('*')) == []
+
+
+def test_from_name(bipa):
+    assert bipa._from_name('voiceless alveolar stop consonant') is bipa.sounds['t']
+    name = 'from aspirated voiceless alveolar stop to voiceless velar stop cluster'
+    cluster = bipa._from_name(name)
+    assert bipa._from_name(name) is cluster
+    assert str(cluster) == 'tʰk'
+
+
+def test_normalize(bipa):
+    assert bipa.normalize('ɡa:') == 'gaː'
+    assert bipa.normalize('ɚ') == 'ə˞'
+    assert bipa._norm('x/ɡ') == 'g'
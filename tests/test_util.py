@@ -11,3 +11,36 @@ def test_TranscriptionBase(tmpdir):
 
     ts = TS(str(tmpdir))
     assert ts.get(None, 5) == 5
+
+
+def test_LRUCache():
+    cache = LRUCache(2)
+    cache['a'] = 1
+    cache['b'] = 2
+    assert cache.get('a') == 1
+    cache['c'] = 3
+    assert 'b' not in cache and 'a' in cache
+    assert cache.get('b') is None
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+    assert len(cache) == 2 and 'hits=1' in repr(cache)
+    cache.clear()
+    assert len(cache) == 0 and cache.hits == 0
+
+    cache = LRUCache(0)
+    cache['a'] = 1
+    assert 'a' not in cache
+
+
+def test_Vocabulary():
+    vocabulary = Vocabulary(['b', 'a'])
+    assert (vocabulary.code('b'), vocabulary.code('a')) == (2, 3)
+    assert vocabulary.code('c') == Vocabulary.UNKNOWN and 'c' not in vocabulary
+    assert vocabulary.code('c', add=True) == 4 and vocabulary[4] == 'c'
+    assert vocabulary.code(None, add=True) == Vocabulary.UNKNOWN
+    assert len(vocabulary) == 5
+
+
+def test_bitmask_jaccard():
+    assert popcount(0b1011) == 3
+    assert bitmask_jaccard(0b1011, 0b0011) == jaccard({0, 1, 3}, {0, 1})
+    assert bitmask_jaccard(0, 0) == 0